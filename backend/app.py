@@ -6,6 +6,7 @@ import os
 import sys
 import uuid
 import json
+import threading
 from datetime import datetime
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
@@ -16,7 +17,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from shared.config import Config
 from shared.db_connector import VideoDAO, AuditLogDAO
-from local_tests.local_test_pipeline import VideoVaultPipeline
+from local_tests.local_test_pipeline import VideoVaultPipeline, create_slice_executor
+from shared.dedup import LocalDedupIndex, dlp_config_fingerprint
+from backend.job_queue import JobQueue
+from backend.ingest import StreamingRequest, ResumableUploads, UploadOffsetMismatch, save_uploaded_file, \
+    discard_uploaded_file
 from functions.ai_agent.agent import VideoVaultAgent
 
 # 初始化Flask应用
@@ -31,8 +36,77 @@ app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB限制
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# 初始化
-pipeline = VideoVaultPipeline(local_mode=Config.LOCAL_MODE)
+# 上传文件直接流式写入上传目录
+StreamingRequest.upload_dir = UPLOAD_FOLDER
+app.request_class = StreamingRequest
+# 续传会话的总大小同样受MAX_CONTENT_LENGTH限制(该配置只约束单个请求，分块上传需要单独检查)
+resumable_uploads = ResumableUploads(UPLOAD_FOLDER, max_size=app.config['MAX_CONTENT_LENGTH'])
+
+# 内容去重索引：相同视频在相同DLP配置下只处理一次
+dedup_index = LocalDedupIndex(os.path.join(UPLOAD_FOLDER, 'dedup_index.json'))
+DLP_CONFIG_FINGERPRINT = dlp_config_fingerprint()
+
+# 每个任务线程使用独立的流水线：DLPScanner保存着参考帧、上一次OCR结果、文字高度估计等逐视频状态，
+# 并发任务共用同一个扫描器会互相清空参考帧、把一个视频的OCR结果混入另一个视频
+_thread_pipelines = threading.local()
+# 切片处理进程池由所有任务线程共用，进程总数保持为PIPELINE_WORKERS，而不是 JOB_WORKERS × PIPELINE_WORKERS
+_slice_executor = None
+_slice_executor_lock = threading.Lock()
+
+
+def get_pipeline():
+    """获取当前线程的处理流水线(首次调用时创建)"""
+    global _slice_executor
+    pipeline = getattr(_thread_pipelines, 'pipeline', None)
+    if pipeline is None:
+        if Config.PIPELINE_WORKERS > 1:
+            with _slice_executor_lock:
+                if _slice_executor is None:
+                    _slice_executor = create_slice_executor(Config.PIPELINE_WORKERS)
+        pipeline = VideoVaultPipeline(local_mode=Config.LOCAL_MODE, executor=_slice_executor)
+        _thread_pipelines.pipeline = pipeline
+    return pipeline
+
+
+def process_video_job(job, progress):
+    """
+    后台任务：处理上传的视频
+    :param job: 任务信息，payload包含 file_path、filename、video_id
+    :param progress: 进度回调
+    :return: 处理结果
+    """
+    payload = job['payload']
+    result = get_pipeline().process_video(
+        payload['file_path'],
+        output_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'output'),
+        video_id=payload['video_id'],
+        progress_callback=progress
+    )
+    if not result.get('success'):
+        raise RuntimeError(result.get('error', '视频处理失败'))
+
+    if payload.get('sha256'):
+        dedup_index.record(
+            payload['sha256'], DLP_CONFIG_FINGERPRINT, result['video_id'], result['output_path'],
+            audit_log_path=os.path.join(os.path.dirname(result['output_path']), result['video_id'], 'audit_log.json'),
+            sensitive_count=result.get('sensitive_count', 0)
+        )
+    return {
+        'video_id': result['video_id'],
+        'sensitive_count': result.get('sensitive_count', 0),
+        'output_path': result.get('output_path', '')
+    }
+
+
+# debug模式下由重载器的父进程监视文件、子进程(带WERKZEUG_RUN_MAIN)处理请求，
+# 只在处理请求的进程中启动工作线程，避免两个进程同时执行同一批任务
+_reloader_parent = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+job_queue = JobQueue(
+    os.path.join(UPLOAD_FOLDER, 'jobs.db'),
+    process_video_job,
+    workers=Config.JOB_WORKERS,
+    start=not _reloader_parent
+)
 if not Config.LOCAL_MODE:
     video_dao = VideoDAO()
     audit_dao = AuditLogDAO()
@@ -75,29 +149,206 @@ def upload_video():
             return jsonify({'error': '文件名为空'}), 400
 
         if not allowed_file(file.filename):
+            discard_uploaded_file(file)
             return jsonify({'error': f'不支持的文件类型，仅支持: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
 
-        # 保存文件
+        # 保存文件(已流式写入磁盘，这里只做改名)
         filename = secure_filename(file.filename)
         video_id = str(uuid.uuid4())
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{video_id}_{filename}")
-        file.save(file_path)
+        file_size, sha256 = save_uploaded_file(file, file_path)
 
-        # 异步处理视频（这里简化为同步，实际可用celery等）
-        # 在生产环境中应该用后台任务
-        result = pipeline.process_video(
-            file_path,
-            output_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'output')
-        )
+        return submit_video_job(file_path, filename, video_id, file_size, sha256)
 
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def submit_video_job(file_path, filename, video_id, file_size, sha256):
+    """
+    提交后台处理任务，立即返回，通过 /api/jobs/<job_id> 查询进度；
+    相同内容已处理过时直接返回已有的脱敏结果和审计日志
+    :return: Flask响应
+    """
+    duplicate = dedup_index.lookup(sha256, DLP_CONFIG_FINGERPRINT)
+    if duplicate:
+        os.remove(file_path)
         return jsonify({
             'success': True,
-            'video_id': result['video_id'],
-            'sensitive_count': result.get('sensitive_count', 0),
-            'output_path': result.get('output_path', ''),
-            'message': '视频处理完成'
+            'duplicate': True,
+            'video_id': duplicate['video_id'],
+            'sha256': sha256,
+            'status': 'completed',
+            'sensitive_count': duplicate.get('sensitive_count', 0),
+            'output_path': duplicate['output_path'],
+            'audit_logs': _load_audit_logs(duplicate),
+            'message': '相同视频已处理过，直接返回已有结果'
         })
 
+    job_id = job_queue.submit({
+        'file_path': file_path,
+        'filename': filename,
+        'video_id': video_id,
+        'file_size': file_size,
+        'sha256': sha256
+    })
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'video_id': video_id,
+        'sha256': sha256,
+        'status': JobQueue.STATUS_QUEUED,
+        'message': '视频已上传，正在排队处理'
+    }), 202
+
+
+def _load_audit_logs(index_entry):
+    """读取去重索引记录对应视频的审计日志"""
+    if not Config.LOCAL_MODE:
+        return audit_dao.get_audit_logs_by_video(index_entry['video_id'])
+
+    audit_log_path = index_entry.get('audit_log_path')
+    if not audit_log_path or not os.path.exists(audit_log_path):
+        return []
+    with open(audit_log_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('detections', [])
+
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """创建分块续传会话，请求体: {"filename": ..., "size": 文件总字节数}"""
+    try:
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename', ''))
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': f'不支持的文件类型，仅支持: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+
+        try:
+            total_size = int(data.get('size', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': '文件大小无效'}), 400
+
+        try:
+            upload = resumable_uploads.create(filename, total_size)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify(upload), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """查询续传会话，offset为服务端已接收的字节数，客户端从该位置继续上传"""
+    upload = resumable_uploads.status(secure_filename(upload_id))
+    if not upload:
+        return jsonify({'error': '上传会话不存在'}), 404
+    return jsonify(upload)
+
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """
+    上传一个分块，请求体为原始字节
+    起始偏移量由 Upload-Offset 头或 Content-Range: bytes start-end/total 头给出，必须等于已接收的字节数；
+    最后一个分块写完后自动提交处理任务
+    """
+    try:
+        upload_id = secure_filename(upload_id)
+        try:
+            offset = _parse_chunk_offset(request.headers)
+        except ValueError:
+            return jsonify({'error': 'Upload-Offset 或 Content-Range 头格式错误'}), 400
+        if offset is None:
+            return jsonify({'error': '缺少 Upload-Offset 或 Content-Range 头'}), 400
+
+        try:
+            upload = resumable_uploads.write_chunk(upload_id, offset, request.stream, request.content_length)
+        except KeyError:
+            return jsonify({'error': '上传会话不存在'}), 404
+        except UploadOffsetMismatch as e:
+            return jsonify({'error': str(e), 'offset': e.expected}), 409
+
+        if not upload['complete']:
+            return jsonify(upload)
+
+        video_id = str(uuid.uuid4())
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{video_id}_{upload['filename']}")
+        file_size, sha256 = resumable_uploads.finalize(upload_id, file_path)
+
+        return submit_video_job(file_path, upload['filename'], video_id, file_size, sha256)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """放弃续传会话"""
+    resumable_uploads.abort(secure_filename(upload_id))
+    return jsonify({'success': True})
+
+
+def _parse_chunk_offset(headers):
+    """
+    从请求头解析分块起始偏移量
+    :return: 偏移量，两个头都没有时返回None
+    :raises ValueError: 头格式错误或偏移量为负
+    """
+    if headers.get('Upload-Offset') is not None:
+        offset = int(headers['Upload-Offset'])
+    else:
+        content_range = headers.get('Content-Range', '')
+        if not content_range.startswith('bytes '):
+            return None
+        offset = int(content_range[len('bytes '):].split('-', 1)[0])
+
+    if offset < 0:
+        raise ValueError(f"偏移量为负: {offset}")
+    return offset
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """获取任务列表"""
+    try:
+        status = request.args.get('status')
+        limit = int(request.args.get('limit', 50))
+        jobs = job_queue.list_jobs(status=status, limit=limit)
+        return jsonify({'jobs': jobs, 'total': len(jobs)})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询任务状态和进度"""
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify(job)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消任务"""
+    try:
+        if not job_queue.get(job_id):
+            return jsonify({'error': '任务不存在'}), 404
+
+        if not job_queue.cancel(job_id):
+            return jsonify({'error': '任务已结束，无法取消'}), 409
+
+        return jsonify({'success': True, 'job': job_queue.get(job_id)})
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -445,6 +696,11 @@ def clear_data():
         import shutil
 
         if Config.LOCAL_MODE:
+            # 排队和执行中的任务还要读取源文件、写出结果，清空会使这些任务失败
+            active_jobs = job_queue.count_active()
+            if active_jobs:
+                return jsonify({'error': f'有 {active_jobs} 个任务正在排队或处理，请等待完成或取消后再清空'}), 409
+
             # 本地模式：删除uploads目录下的所有文件
             upload_dir = app.config['UPLOAD_FOLDER']
             output_dir = os.path.join(upload_dir, 'output')
@@ -465,8 +721,8 @@ def clear_data():
             if os.path.exists(upload_dir):
                 for item in os.listdir(upload_dir):
                     item_path = os.path.join(upload_dir, item)
-                    # 跳过output目录
-                    if item == 'output':
+                    # 跳过output目录、任务队列数据库和未完成的续传会话
+                    if item in ('output', 'jobs.db', 'incoming'):
                         continue
                     try:
                         if os.path.isfile(item_path):
@@ -511,6 +767,10 @@ if __name__ == '__main__':
     print("\nAPI接口:")
     print("  GET  /api/health           - 健康检查")
     print("  POST /api/videos/upload    - 上传视频")
+    print("  POST /api/uploads          - 创建分块续传会话")
+    print("  PUT  /api/uploads/<id>     - 上传分块")
+    print("  GET  /api/jobs/<id>        - 任务状态")
+    print("  POST /api/jobs/<id>/cancel - 取消任务")
     print("  GET  /api/videos           - 视频列表")
     print("  GET  /api/videos/<id>      - 视频详情")
     print("  GET  /api/audit/logs       - 审计日志")
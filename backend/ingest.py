@@ -0,0 +1,284 @@
+"""
+上传接收模块
+上传内容按块直接写入上传目录并同时计算SHA-256，避免整段缓冲到内存后再复制一次；
+支持基于偏移量的分块续传，中断的上传可以从已接收的位置继续
+"""
+import os
+import json
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+from flask import Request
+
+# 每次从请求流读取的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingFile:
+    """写入时同步计算SHA-256的文件对象"""
+
+    def __init__(self, path, mode='wb+', hasher=None):
+        """
+        初始化
+        :param path: 目标文件路径
+        :param mode: 打开模式
+        :param hasher: 已有的哈希状态(续传时沿用)
+        """
+        self.path = path
+        self.file = open(path, mode)
+        self.hasher = hasher or hashlib.sha256()
+        self.size = self.file.tell() if 'a' in mode else 0
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class StreamingRequest(Request):
+    """
+    multipart上传的文件部分直接写入上传目录(而不是Werkzeug默认的临时文件)，
+    并在写入过程中计算哈希；接口只需把文件改名到最终位置
+    """
+
+    upload_dir = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not self.upload_dir:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        incoming_dir = os.path.join(self.upload_dir, 'incoming')
+        os.makedirs(incoming_dir, exist_ok=True)
+        stream = HashingFile(os.path.join(incoming_dir, f"{uuid.uuid4().hex}.part"))
+        self.__dict__.setdefault('_incoming_files', []).append(stream)
+        return stream
+
+    def close(self):
+        """
+        请求结束时(Flask在请求上下文出栈时调用)关闭并删除未被save_uploaded_file采用的上传文件，
+        包括字段缺失、校验失败、处理异常以及请求体中途断开的情况
+        """
+        try:
+            super().close()
+        finally:
+            for stream in self.__dict__.pop('_incoming_files', []):
+                stream.file.close()
+                if os.path.exists(stream.path):
+                    os.remove(stream.path)
+
+
+def save_uploaded_file(file_storage, dest_path):
+    """
+    保存上传的文件
+    由StreamingRequest接收的文件已经在磁盘上，直接改名；否则按块复制并计算哈希
+    :param file_storage: Werkzeug FileStorage
+    :param dest_path: 目标路径
+    :return: (文件大小, SHA-256)
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingFile):
+        stream.file.close()
+        os.replace(stream.path, dest_path)
+        return stream.size, stream.hexdigest()
+
+    stream.seek(0)
+    return write_stream(stream, dest_path)
+
+
+def discard_uploaded_file(file_storage):
+    """删除StreamingRequest已写入磁盘但未被采用的上传文件"""
+    stream = file_storage.stream
+    if isinstance(stream, HashingFile):
+        stream.file.close()
+        if os.path.exists(stream.path):
+            os.remove(stream.path)
+
+
+def write_stream(stream, dest_path, chunk_size=CHUNK_SIZE, limit=None):
+    """
+    将输入流按块写入文件并计算哈希
+    :param stream: 可读的流
+    :param dest_path: 目标路径
+    :param chunk_size: 块大小
+    :param limit: 最多读取的字节数
+    :return: (写入字节数, SHA-256)
+    """
+    out = HashingFile(dest_path, 'wb')
+    try:
+        _copy_stream(stream, out, chunk_size, limit)
+    finally:
+        out.file.close()
+    return out.size, out.hexdigest()
+
+
+def _copy_stream(stream, out, chunk_size=CHUNK_SIZE, limit=None):
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = stream.read(chunk_size if remaining is None else min(chunk_size, remaining))
+        if not chunk:
+            break
+        out.write(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+class UploadOffsetMismatch(Exception):
+    """分块的起始偏移量与已接收的字节数不一致"""
+
+    def __init__(self, expected):
+        super().__init__(f"偏移量不匹配，服务端已接收 {expected} 字节")
+        self.expected = expected
+
+
+class ResumableUploads:
+    """
+    分块续传会话管理
+    每个会话在 incoming 目录下保存 {upload_id}.part(已接收的数据)和 {upload_id}.json(元数据)，
+    已接收的字节数即 .part 文件大小，因此进程重启后也能继续
+    """
+
+    def __init__(self, upload_dir, max_size=None):
+        """
+        :param upload_dir: 上传目录
+        :param max_size: 单个文件的最大字节数，为None时不限制
+        """
+        self.incoming_dir = os.path.join(upload_dir, 'incoming')
+        self.max_size = max_size
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._session_locks = {}
+        # 进程内保存的增量哈希状态，重启后首次续传时从已接收的数据重新计算
+        self._hashers = {}
+
+    def _paths(self, upload_id):
+        base = os.path.join(self.incoming_dir, upload_id)
+        return f"{base}.part", f"{base}.json"
+
+    def _session_lock(self, upload_id):
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def create(self, filename, total_size):
+        """
+        创建上传会话
+        :param filename: 原始文件名
+        :param total_size: 文件总大小(字节)，写入的数据不会超过该大小
+        :return: 会话信息
+        :raises ValueError: 文件大小不是正数或超过上限
+        """
+        total_size = int(total_size)
+        if total_size <= 0:
+            raise ValueError('文件大小无效')
+        if self.max_size is not None and total_size > self.max_size:
+            raise ValueError(f'文件大小超过上限 {self.max_size // (1024 * 1024)}MB')
+
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'total_size': total_size,
+            'created_at': datetime.now().isoformat()
+        }
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._hashers[upload_id] = hashlib.sha256()
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """
+        查询会话状态
+        :param upload_id: 会话ID
+        :return: 会话信息(含已接收字节数offset)，不存在时返回None
+        """
+        part_path, meta_path = self._paths(upload_id)
+        if not os.path.exists(meta_path) or not os.path.exists(part_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['offset'] = os.path.getsize(part_path)
+        meta['complete'] = meta['offset'] >= meta['total_size']
+        return meta
+
+    def write_chunk(self, upload_id, offset, stream, length=None):
+        """
+        从指定偏移量追加一个分块
+        :param upload_id: 会话ID
+        :param offset: 分块起始偏移量，必须等于已接收的字节数
+        :param stream: 分块数据流
+        :param length: 分块长度
+        :return: 更新后的会话信息
+        """
+        with self._session_lock(upload_id):
+            meta = self.status(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            if offset != meta['offset']:
+                raise UploadOffsetMismatch(meta['offset'])
+
+            remaining = meta['total_size'] - offset
+            limit = remaining if length is None else min(length, remaining)
+
+            part_path, _ = self._paths(upload_id)
+            hasher = self._hashers.get(upload_id) or self._rehash(part_path)
+            out = HashingFile(part_path, 'ab', hasher=hasher)
+            try:
+                _copy_stream(stream, out, limit=limit)
+                out.flush()
+                os.fsync(out.fileno())
+            except Exception:
+                # 连接中断时已写入的数据保留用于续传，丢弃哈希状态，下次续传时按文件内容重新计算
+                self._hashers.pop(upload_id, None)
+                raise
+            finally:
+                out.file.close()
+            self._hashers[upload_id] = out.hasher
+            return self.status(upload_id)
+
+    def finalize(self, upload_id, dest_path):
+        """
+        完成上传：把数据文件移动到最终位置
+        :param upload_id: 会话ID
+        :param dest_path: 目标路径
+        :return: (文件大小, SHA-256)
+        """
+        with self._session_lock(upload_id):
+            meta = self.status(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            if not meta['complete']:
+                raise UploadOffsetMismatch(meta['offset'])
+
+            part_path, meta_path = self._paths(upload_id)
+            hasher = self._hashers.pop(upload_id, None) or self._rehash(part_path)
+            os.replace(part_path, dest_path)
+            os.remove(meta_path)
+
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+        return meta['total_size'], hasher.hexdigest()
+
+    def abort(self, upload_id):
+        """放弃上传会话并删除已接收的数据"""
+        with self._session_lock(upload_id):
+            for path in self._paths(upload_id):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._hashers.pop(upload_id, None)
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+
+    @staticmethod
+    def _rehash(path):
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return hasher
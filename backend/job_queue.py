@@ -0,0 +1,245 @@
+"""
+后台任务队列
+基于SQLite持久化的本地任务队列，使用有界工作线程池执行视频处理任务
+"""
+import json
+import sqlite3
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobQueue:
+    """持久化任务队列"""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+
+    def __init__(self, db_path, handler, workers=2, poll_interval=1.0, start=True):
+        """
+        初始化并启动工作线程
+        :param db_path: SQLite数据库文件路径
+        :param handler: 任务处理函数 handler(job, progress)，
+                        progress(stage, fraction) 用于上报进度，任务被取消时会抛出JobCancelled
+        :param workers: 工作线程数
+        :param poll_interval: 空闲时轮询队列的间隔(秒)
+        :param start: 是否立即启动工作线程，为False时只能提交和查询任务，需要时再调用start()
+        """
+        self.db_path = db_path
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads = []
+
+        self._init_db()
+        if start:
+            self.start()
+
+    def start(self):
+        """把上次未执行完的任务放回队列并启动工作线程(重复调用无效)"""
+        if self._threads:
+            return
+        self._requeue_interrupted()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @contextmanager
+    def _connection(self):
+        """获取SQLite连接(上下文管理器)，退出时提交并关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._lock, self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def _requeue_interrupted(self):
+        """进程重启后，把上次未执行完的任务重新放回队列"""
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, progress = 0 WHERE status = ?",
+                (self.STATUS_QUEUED, self.STATUS_RUNNING)
+            )
+
+    def submit(self, payload, job_id=None):
+        """
+        提交任务
+        :param payload: 任务参数(可JSON序列化的dict)
+        :param job_id: 任务ID，默认生成UUID
+        :return: 任务ID
+        """
+        job_id = job_id or str(uuid.uuid4())
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, payload, status, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(payload, ensure_ascii=False), self.STATUS_QUEUED, _now())
+            )
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        """
+        查询任务
+        :param job_id: 任务ID
+        :return: 任务信息dict，不存在时返回None
+        """
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list_jobs(self, status=None, limit=50):
+        """列出最近的任务"""
+        with self._connection() as conn:
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def count_active(self):
+        """排队中和执行中的任务数"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM jobs WHERE status IN (?, ?)", (self.STATUS_QUEUED, self.STATUS_RUNNING)
+            ).fetchone()
+        return row['n']
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务立即取消，运行中的任务在下一次上报进度时中止
+        :param job_id: 任务ID
+        :return: 是否已受理取消请求
+        """
+        with self._lock, self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                (self.STATUS_CANCELLED, _now(), job_id, self.STATUS_QUEUED)
+            )
+            if cursor.rowcount:
+                return True
+
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                (job_id, self.STATUS_RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def shutdown(self):
+        """停止工作线程(正在执行的任务会继续执行完)"""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _claim_next(self):
+        """
+        原子地领取最早排队的任务
+        同一个数据库可能被多个进程的工作线程共用，领取以带状态条件的UPDATE为准，被其它进程抢先时取下一个
+        """
+        with self._lock, self._connection() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (self.STATUS_QUEUED,)
+                ).fetchone()
+                if not row:
+                    return None
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ? WHERE job_id = ? AND status = ?",
+                    (self.STATUS_RUNNING, _now(), row['job_id'], self.STATUS_QUEUED)
+                )
+                if cursor.rowcount:
+                    break
+        job = _row_to_job(row)
+        job['status'] = self.STATUS_RUNNING
+        return job
+
+    def _worker_loop(self):
+        while not self._stopping:
+            job = self._claim_next()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job_id = job['job_id']
+
+        def progress(stage, fraction):
+            with self._lock, self._connection() as conn:
+                conn.execute(
+                    "UPDATE jobs SET stage = ?, progress = ? WHERE job_id = ?",
+                    (stage, round(fraction, 4), job_id)
+                )
+                row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row and row['cancel_requested']:
+                raise JobCancelled(job_id)
+
+        try:
+            result = self.handler(job, progress)
+            self._finish(job_id, self.STATUS_COMPLETED, result=result, progress=1.0)
+        except JobCancelled:
+            print(f"任务已取消: {job_id}")
+            self._finish(job_id, self.STATUS_CANCELLED)
+        except Exception as e:
+            print(f"任务执行失败: {job_id}, 错误: {e}")
+            traceback.print_exc()
+            self._finish(job_id, self.STATUS_FAILED, error=str(e))
+
+    def _finish(self, job_id, status, result=None, error=None, progress=None):
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "progress = COALESCE(?, progress) WHERE job_id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, _now(), progress, job_id)
+            )
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def _row_to_job(row):
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
@@ -50,10 +50,8 @@ class VideoVaultToolsServerless:
         all_logs = []
 
         try:
-            # 列出logs/目录下的所有文件
-            log_files = self.obs_helper.list_objects(prefix='logs/')
-
-            for log_key in log_files:
+            # 分页遍历logs/目录下的文件(只取顶层，跳过 logs/{video_id}/ 下的切片审计分片)
+            for log_key in self.obs_helper.iter_objects(prefix='logs/', delimiter='/'):
                 if not log_key.endswith('_audit.json'):
                     continue
 
@@ -85,10 +83,8 @@ class VideoVaultToolsServerless:
         videos = []
 
         try:
-            # 列出outputs/目录下的所有文件
-            output_files = self.obs_helper.list_objects(prefix='outputs/')
-
-            for output_key in output_files:
+            # 分页遍历outputs/目录下的所有文件
+            for output_key in self.obs_helper.iter_objects(prefix='outputs/'):
                 if not output_key.endswith('_sanitized.mp4'):
                     continue
 
@@ -11,7 +11,8 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from shared.video_merger import VideoMerger
 from shared.obs_helper import OBSHelper
-from shared.db_connector import VideoDAO
+from shared.db_connector import VideoDAO, ContentIndexDAO
+from shared.audit_log import compact_audit_shards, audit_log_key
 from shared.config import Config
 
 
@@ -23,7 +24,8 @@ def handler(event, context):
     {
         "video_id": "abc-123-def",
         "total_slices": 3,
-        "bucket_name": "video-vault-storage"
+        "bucket_name": "video-vault-storage",
+        "video_title": "demo.mp4"  # 可选，缺省时从数据库查询
     }
 
     :param event: 调用事件
@@ -45,13 +47,15 @@ def handler(event, context):
         # 尝试初始化数据库DAO（可选，完全容错）
         db_enabled = False
         video_dao = None
+        content_index_dao = None
 
         # 检查是否配置了数据库环境变量
         if os.getenv('DB_HOST') and os.getenv('DB_PASSWORD'):
             try:
                 video_dao = VideoDAO()
                 # 尝试测试连接（避免延迟失败）
-                video_dao.connection.ping(reconnect=True)
+                video_dao.db.ping()
+                content_index_dao = ContentIndexDAO()
                 db_enabled = True
                 logger.info("数据库连接成功")
             except Exception as e:
@@ -61,14 +65,16 @@ def handler(event, context):
         else:
             logger.info("未配置数据库环境变量（DB_HOST/DB_PASSWORD），跳过数据库操作")
 
-        # 下载所有处理后的切片
-        slice_files = []
-        for i in range(total_slices):
-            slice_key = f"processed/{video_id}/slice_{i:04d}.mp4"
-            local_slice_path = f"/tmp/{video_id}_slice_{i:04d}.mp4"
-
-            obs_helper.download_file(slice_key, local_slice_path)
-            slice_files.append(local_slice_path)
+        # 并发下载所有处理后的切片
+        downloads = [
+            (f"processed/{video_id}/slice_{i:04d}.mp4", f"/tmp/{video_id}_slice_{i:04d}.mp4")
+            for i in range(total_slices)
+        ]
+        download_results = obs_helper.download_many(downloads)
+        failed = [slice_key for slice_key, success in download_results.items() if not success]
+        if failed:
+            raise Exception(f"下载切片失败: {failed}")
+        slice_files = [local_slice_path for _, local_slice_path in downloads]
 
         logger.info(f"已下载 {len(slice_files)} 个切片")
 
@@ -85,12 +91,23 @@ def handler(event, context):
         output_key = f"outputs/{video_id}_sanitized.mp4"
         obs_helper.upload_file(output_path, output_key)
 
-        logger.info(f"合并视频已上传: {output_key}")
+        logger.info(f"合并视频已上传: {output_key}，OBS传输统计: {obs_helper.get_transfer_stats()}")
+
+        # 压缩各切片的审计分片为完整审计文档
+        try:
+            video_title = event.get('video_title') or _lookup_video_title(video_dao, video_id, logger)
+            audit_data = compact_audit_shards(obs_helper, video_id, video_title=video_title)
+            logger.info(f"审计日志已压缩: {audit_log_key(video_id)}，"
+                        f"{audit_data['shard_count']} 个分片，{audit_data['total_detections']} 条记录")
+        except Exception as e:
+            logger.error(f"压缩审计日志失败: {e}")
 
         # 更新数据库状态（可选）
         if db_enabled and video_dao:
             try:
                 video_dao.update_video_status(video_id, 'completed', output_url=f"obs://{bucket_name}/{output_key}")
+                # 登记到去重索引，之后重复上传的相同视频直接复用本次结果
+                content_index_dao.mark_completed(video_id, output_key, audit_log_key(video_id))
                 logger.info("数据库状态已更新")
             except Exception as e:
                 logger.warning(f"更新数据库失败: {e}")
@@ -120,6 +137,7 @@ def handler(event, context):
         if db_enabled and video_dao:
             try:
                 video_dao.update_video_status(video_id, 'failed')
+                content_index_dao.mark_failed(video_id)
             except Exception as db_error:
                 logger.warning(f"更新数据库失败状态失败: {db_error}")
 
@@ -129,3 +147,15 @@ def handler(event, context):
                 "error": str(e)
             })
         }
+
+
+def _lookup_video_title(video_dao, video_id, logger):
+    """从数据库查询视频标题，未启用数据库或查询失败时返回None(审计文档以video_id作为标题)"""
+    if video_dao is None:
+        return None
+    try:
+        video = video_dao.get_video_by_id(video_id)
+        return video.get('title') if video else None
+    except Exception as e:
+        logger.warning(f"查询视频标题失败: {e}")
+        return None
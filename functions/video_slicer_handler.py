@@ -16,6 +16,8 @@ sys.path.insert(0, os.path.dirname(__file__))
 from shared.video_slicer import VideoSlicer
 from shared.obs_helper import OBSHelper
 from shared.config import Config
+from shared.dedup import file_sha256, dlp_config_fingerprint
+from shared.audit_log import alias_audit_log, audit_log_key
 
 
 def handler(event, context):
@@ -59,28 +61,46 @@ def handler(event, context):
 
         # 下载视频到临时目录
         local_video_path = f"/tmp/{video_id}.mp4"
-        obs_helper.download_file(object_key, local_video_path)
+        obs_helper.download_file(object_key, local_video_path, size=obs_data['object'].get('size'))
 
         logger.info(f"视频已下载: {local_video_path}")
 
+        # 内容去重：相同内容在相同DLP配置下已处理过时，直接返回已有的脱敏结果和审计日志
+        content_hash = file_sha256(local_video_path)
+        duplicate = _find_processed_duplicate(content_hash, video_id, logger)
+        if duplicate and _alias_duplicate_outputs(obs_helper, duplicate, video_id, bucket_name, logger):
+            os.remove(local_video_path)
+            return {
+                "statusCode": 200,
+                "body": json.dumps({
+                    "video_id": video_id,
+                    "duplicate_of": duplicate['video_id'],
+                    "content_hash": content_hash,
+                    "output_key": f"outputs/{video_id}_sanitized.mp4",
+                    "audit_log_key": audit_log_key(video_id),
+                    "status": "completed"
+                })
+            }
+
         # 切片
         slicer = VideoSlicer(slice_duration=Config.SLICE_DURATION)
         slices_dir = f"/tmp/{video_id}_slices"
         os.makedirs(slices_dir, exist_ok=True)
 
-        slice_files = slicer.slice_video(local_video_path, slices_dir)
+        segments = slicer.slice_video_segments(local_video_path, slices_dir)
 
-        logger.info(f"切片完成: {len(slice_files)} 个切片")
+        logger.info(f"切片完成: {len(segments)} 个切片")
 
-        # 上传切片到OBS
-        slice_keys = []
-        for slice_file in slice_files:
-            slice_name = os.path.basename(slice_file)
-            slice_key = f"slices/{video_id}/{slice_name}"
-            obs_helper.upload_file(slice_file, slice_key)
-            slice_keys.append(slice_key)
+        # 并发上传切片到OBS
+        slice_keys = [f"slices/{video_id}/{os.path.basename(segment['path'])}" for segment in segments]
+        upload_results = obs_helper.upload_many([
+            (segment['path'], slice_key) for segment, slice_key in zip(segments, slice_keys)
+        ])
+        failed = [slice_key for slice_key, success in upload_results.items() if not success]
+        if failed:
+            raise Exception(f"上传切片失败: {failed}")
 
-        logger.info(f"切片已上传到OBS: {len(slice_keys)} 个")
+        logger.info(f"切片已上传到OBS: {len(slice_keys)} 个，OBS传输统计: {obs_helper.get_transfer_stats()}")
 
         # 清理临时文件
         import shutil
@@ -105,7 +125,9 @@ def handler(event, context):
                 "slice_index": idx,
                 "slice_key": slice_key,
                 "bucket_name": bucket_name,
-                "total_slices": len(slice_keys)
+                "total_slices": len(slice_keys),
+                "start_time": segments[idx]['start_time'],
+                "end_time": segments[idx]['end_time']
             }
 
             # 异步调用DLP扫描函数
@@ -122,6 +144,7 @@ def handler(event, context):
             "statusCode": 200,
             "body": json.dumps({
                 "video_id": video_id,
+                "content_hash": content_hash,
                 "slice_count": len(slice_keys),
                 "slice_keys": slice_keys
             })
@@ -138,3 +161,57 @@ def handler(event, context):
                 "error": str(e)
             })
         }
+
+
+def _find_processed_duplicate(content_hash, video_id, logger):
+    """
+    查询去重索引，未命中时登记本次处理
+    数据库未配置或不可用时不去重
+    :param content_hash: 视频内容SHA-256
+    :param video_id: 本次处理的视频ID
+    :return: 已完成的索引记录，未命中返回None
+    """
+    if not (os.getenv('DB_HOST') and os.getenv('DB_PASSWORD')):
+        return None
+
+    try:
+        from shared.db_connector import ContentIndexDAO
+        content_index_dao = ContentIndexDAO()
+        config_fingerprint = dlp_config_fingerprint()
+
+        duplicate = content_index_dao.find_completed(content_hash, config_fingerprint)
+        if duplicate:
+            return duplicate
+
+        content_index_dao.register(content_hash, config_fingerprint, video_id)
+    except Exception as e:
+        logger.warning(f"去重索引不可用，按新视频处理: {e}")
+    return None
+
+
+def _alias_duplicate_outputs(obs_helper, duplicate, video_id, bucket_name, logger):
+    """
+    把已处理视频的脱敏结果和审计文档复制到本次视频ID的键下
+    本函数由OBS触发，返回值没有读取方；前端按 outputs/{video_id}_sanitized.mp4 和
+    logs/{video_id}_audit.json 轮询结果，因此必须在这两个键下生成对象
+    :param duplicate: 去重索引记录
+    :param video_id: 本次处理的视频ID
+    :return: 是否复制成功，失败时调用方按新视频正常处理
+    """
+    output_key = f"outputs/{video_id}_sanitized.mp4"
+    try:
+        if not obs_helper.copy_object(duplicate['obs_output_path'], output_key):
+            raise RuntimeError(f"复制脱敏视频失败: {duplicate['obs_output_path']}")
+        alias_audit_log(obs_helper, duplicate['video_id'], video_id)
+    except Exception as e:
+        logger.warning(f"复用 {duplicate['video_id']} 的处理结果失败，按新视频处理: {e}")
+        return False
+
+    logger.info(f"视频内容与 {duplicate['video_id']} 相同，已复用处理结果: {output_key}")
+
+    try:
+        from shared.db_connector import VideoDAO
+        VideoDAO().update_video_status(video_id, 'completed', output_url=f"obs://{bucket_name}/{output_key}")
+    except Exception as e:
+        logger.warning(f"更新数据库失败: {e}")
+    return True
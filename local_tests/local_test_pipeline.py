@@ -6,7 +6,8 @@ import os
 import sys
 import uuid
 import json
-import cv2
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # 添加项目根目录到路径
@@ -15,19 +16,81 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from shared.config import Config
 from shared.video_slicer import VideoSlicer
 from shared.dlp_scanner import DLPScanner, SensitiveInfoMasker
+from shared.slice_processor import StreamingSliceProcessor
 from shared.video_merger import VideoMerger
+from shared.metrics import merge_snapshots
+from shared.ocr_cache import diff_cache_stats, merge_cache_stats
 from shared.db_connector import VideoDAO, AuditLogDAO
 
 
+# 工作进程内的切片处理器（每个进程独立的DLPScanner/OCR实例）
+_worker_processor = None
+
+
+def _init_slice_worker():
+    """进程池初始化：每个工作进程创建一次扫描器和脱敏器"""
+    global _worker_processor
+    scanner = DLPScanner(confidence_threshold=Config.OCR_CONFIDENCE_THRESHOLD)
+    masker = SensitiveInfoMasker(blur_intensity=Config.BLUR_INTENSITY)
+    _worker_processor = StreamingSliceProcessor(scanner, masker, interval=Config.SAMPLE_INTERVAL)
+
+
+def _process_slice_worker(slice_file, processed_slice_path):
+    """
+    在工作进程中处理单个切片
+    :return: StreamingSliceProcessor.process的结果，附带该切片的OCR统计
+    """
+    scanner = _worker_processor.scanner
+    scanner.reset_stats()
+    cache_before = scanner.ocr_service.get_cache_stats()
+    result = _worker_processor.process(slice_file, processed_slice_path)
+    result['ocr_stats'] = scanner.get_stats()
+    # 进程内的缓存计数跨切片累加，只取本切片的增量
+    result['ocr_stats']['ocr_cache'] = diff_cache_stats(result['ocr_stats']['ocr_cache'], cache_before)
+    return result
+
+
+def _merge_ocr_stats(stats_list):
+    """汇总多个切片的OCR统计"""
+    merged = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if isinstance(value, int):
+                merged[key] = merged.get(key, 0) + value
+    frames = merged.get('frames_scanned', 0)
+    merged['skip_ratio'] = merged.get('ocr_skipped', 0) / frames if frames else 0.0
+    merged['ocr_cache'] = merge_cache_stats([stats.get('ocr_cache') for stats in stats_list])
+    merged['ocr_latency'] = merge_snapshots([stats.get('ocr_latency') for stats in stats_list])
+    return merged
+
+
+def create_slice_executor(workers):
+    """创建切片处理进程池，使用spawn避免在多线程的Flask进程中fork"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_slice_worker
+    )
+
+
 class VideoVaultPipeline:
     """Video Vault 处理流水线"""
 
-    def __init__(self, local_mode=True):
-        """初始化"""
+    def __init__(self, local_mode=True, workers=None, executor=None):
+        """
+        初始化
+        :param local_mode: 是否本地模式
+        :param workers: 并行处理切片的进程数，默认读取PIPELINE_WORKERS，1为顺序处理
+        :param executor: 外部传入的切片处理进程池(多个流水线共用，close()时不关闭)，默认按需自建
+        """
         self.local_mode = local_mode
+        self.workers = workers or Config.PIPELINE_WORKERS
+        self._executor = executor
+        self._owns_executor = executor is None
         self.video_slicer = VideoSlicer(slice_duration=Config.SLICE_DURATION)
         self.dlp_scanner = DLPScanner(confidence_threshold=Config.OCR_CONFIDENCE_THRESHOLD)
         self.masker = SensitiveInfoMasker(blur_intensity=Config.BLUR_INTENSITY)
+        self.slice_processor = StreamingSliceProcessor(self.dlp_scanner, self.masker, interval=Config.SAMPLE_INTERVAL)
         self.video_merger = VideoMerger()
 
         # 如果不是本地模式，初始化数据库
@@ -38,16 +101,21 @@ class VideoVaultPipeline:
         print("=" * 60)
         print("Video Vault DLP 处理流水线已初始化")
         print(f"运行模式: {'本地测试' if local_mode else '云端生产'}")
+        print(f"切片并行度: {self.workers}")
         print("=" * 60)
 
-    def process_video(self, input_video_path, output_dir='./local_tests/output'):
+    def process_video(self, input_video_path, output_dir='./local_tests/output', video_id=None,
+                      progress_callback=None):
         """
         处理单个视频的完整流程
         :param input_video_path: 输入视频路径
         :param output_dir: 输出目录
+        :param video_id: 视频ID，默认生成UUID
+        :param progress_callback: 进度回调 progress_callback(stage, fraction)，回调抛出的异常会中止处理
         :return: 处理结果
         """
-        video_id = str(uuid.uuid4())
+        video_id = video_id or str(uuid.uuid4())
+        progress = progress_callback or (lambda stage, fraction: None)
         video_title = os.path.basename(input_video_path)
 
         print(f"\n🎬 开始处理视频: {video_title}")
@@ -73,7 +141,9 @@ class VideoVaultPipeline:
 
         # ============ 阶段1: 视频切片 ============
         print("\n📹 阶段1: 视频切片")
-        slice_files = self.video_slicer.slice_video(input_video_path, slices_dir)
+        progress('slicing', 0.0)
+        segments = self.video_slicer.slice_video_segments(input_video_path, slices_dir)
+        slice_files = [segment['path'] for segment in segments]
         print(f"✅ 切片完成: {len(slice_files)} 个切片\n")
 
         # ============ 阶段2: DLP扫描与脱敏 ============
@@ -82,29 +152,20 @@ class VideoVaultPipeline:
         total_sensitive_count = 0
         all_detections = []  # 收集所有检测结果用于审计日志
 
-        for slice_idx, slice_file in enumerate(slice_files):
-            print(f"\n--- 处理切片 {slice_idx + 1}/{len(slice_files)}: {os.path.basename(slice_file)} ---")
-
-            # 提取关键帧
-            frames = self.video_slicer.extract_keyframes(slice_file, interval=1.0)
+        # 扫描与脱敏（顺序或多进程并行），结果按切片顺序返回
+        slice_results, ocr_stats = self._process_slices(slice_files, processed_dir, progress)
 
-            # 扫描关键帧
-            scan_results = self.dlp_scanner.scan_video_frames(frames)
+        for slice_idx, slice_file in enumerate(slice_files):
+            process_result = slice_results[slice_idx]
+            processed_slice_path = process_result['output_path']
+            scan_results = process_result['scan_results']
 
             if not scan_results:
-                print("  ✓ 未发现敏感信息，直接使用原切片")
+                print(f"  ✓ 切片 {slice_idx} 未发现敏感信息，直接使用原切片")
                 processed_slices.append(slice_file)
                 continue
 
-            # 发现敏感信息，需要处理视频
-            print(f"  ⚠️  发现 {len(scan_results)} 帧包含敏感信息，开始脱敏...")
-
-            # 创建敏感帧映射
-            sensitive_frames = {result['frame_id']: result for result in scan_results}
-
-            # 逐帧处理视频
-            processed_slice_path = os.path.join(processed_dir, f"processed_{os.path.basename(slice_file)}")
-            self._process_slice_video(slice_file, processed_slice_path, sensitive_frames)
+            print(f"  ⚠️  切片 {slice_idx} 发现 {len(scan_results)} 帧包含敏感信息，已完成脱敏")
 
             processed_slices.append(processed_slice_path)
 
@@ -119,6 +180,7 @@ class VideoVaultPipeline:
                         'slice_index': slice_idx,
                         'frame_id': result['frame_id'],
                         'timestamp': result['timestamp'],
+                        'video_timestamp': segments[slice_idx]['start_time'] + result['timestamp'],
                         'type': detection['sensitive_type'],
                         'text': detection['ocr_text'][:100],
                         'confidence': detection['ocr_confidence'],
@@ -131,23 +193,34 @@ class VideoVaultPipeline:
                     }
                     all_detections.append(detection_record)
 
-                    # 如果不是本地模式，写入数据库
-                    if not self.local_mode:
-                        self.audit_dao.create_audit_log(
-                            video_id=video_id,
-                            slice_index=slice_idx,
-                            frame_id=result['frame_id'],
-                            timestamp_in_video=result['timestamp'],
-                            sensitive_type=detection['sensitive_type'],
-                            detected_text=detection['ocr_text'][:100],
-                            confidence=detection['ocr_confidence'],
-                            bbox_x=bbox[0],
-                            bbox_y=bbox[1],
-                            bbox_width=bbox[2],
-                            bbox_height=bbox[3]
-                        )
-
-        print(f"\n✅ DLP扫描完成: 共检测到 {total_sensitive_count} 个敏感信息\n")
+        # 如果不是本地模式，批量写入数据库
+        if not self.local_mode:
+            self.audit_dao.create_audit_logs_bulk([{
+                'video_id': video_id,
+                'slice_index': record['slice_index'],
+                'frame_id': record['frame_id'],
+                'timestamp_in_video': record['timestamp'],
+                'sensitive_type': record['type'],
+                'detected_text': record['text'],
+                'confidence': record['confidence'],
+                'bbox_x': record['bbox']['x'],
+                'bbox_y': record['bbox']['y'],
+                'bbox_width': record['bbox']['width'],
+                'bbox_height': record['bbox']['height']
+            } for record in all_detections])
+
+        print(f"\n✅ DLP扫描完成: 共检测到 {total_sensitive_count} 个敏感信息")
+        print(f"OCR统计: 扫描 {ocr_stats['frames_scanned']} 帧，调用OCR {ocr_stats['ocr_calls']} 次，"
+              f"跳过 {ocr_stats['ocr_skipped']} 次 ({ocr_stats['skip_ratio']:.0%})")
+        if ocr_stats.get('ocr_no_text') or ocr_stats.get('ocr_text_roi'):
+            print(f"文字区域检测: 无文字跳过 {ocr_stats['ocr_no_text']} 帧，只识别文字区域 {ocr_stats['ocr_text_roi']} 帧")
+        if ocr_stats['ocr_cache']:
+            print(f"OCR缓存命中率: {ocr_stats['ocr_cache']['hit_ratio']:.0%}")
+        latency = ocr_stats['ocr_latency']
+        if latency['count']:
+            print(f"OCR耗时: 平均 {latency['avg_ms']:.0f}ms，P50 {latency['p50_ms']:.0f}ms，"
+                  f"P90 {latency['p90_ms']:.0f}ms，P99 {latency['p99_ms']:.0f}ms")
+        print()
 
         # 如果是本地模式，保存审计日志到文件
         if self.local_mode:
@@ -164,6 +237,7 @@ class VideoVaultPipeline:
 
         # ============ 阶段3: 视频合并 ============
         print("\n🎞️  阶段3: 合并处理后的视频")
+        progress('merging', 0.9)
         final_output_path = os.path.join(output_dir, f"{video_id}_sanitized.mp4")
         success = self.video_merger.merge(processed_slices, final_output_path, use_ffmpeg=True)
 
@@ -181,7 +255,8 @@ class VideoVaultPipeline:
                 'success': True,
                 'video_id': video_id,
                 'output_path': final_output_path,
-                'sensitive_count': total_sensitive_count
+                'sensitive_count': total_sensitive_count,
+                'ocr_stats': ocr_stats
             }
         else:
             print("❌ 视频合并失败")
@@ -194,41 +269,65 @@ class VideoVaultPipeline:
                 'error': '视频合并失败'
             }
 
-    def _process_slice_video(self, input_path, output_path, sensitive_frames):
+    def _process_slices(self, slice_files, processed_dir, progress):
         """
-        处理单个切片视频，对敏感帧进行脱敏
-        :param input_path: 输入视频路径
-        :param output_path: 输出视频路径
-        :param sensitive_frames: 敏感帧映射 {frame_id: scan_result}
+        扫描并脱敏所有切片
+        :param slice_files: 切片文件列表
+        :param processed_dir: 脱敏切片输出目录
+        :param progress: 进度回调，每完成一个切片上报一次(扫描阶段占总进度的0.1~0.9)
+        :return: (按切片顺序排列的处理结果列表, OCR统计)
         """
-        cap = cv2.VideoCapture(input_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-        frame_id = 0
-        interval_frames = int(fps * 1.0)  # 对应提取关键帧的间隔
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # 检查当前帧是否需要脱敏
-            keyframe_id = frame_id // interval_frames
-            if keyframe_id in sensitive_frames:
-                result = sensitive_frames[keyframe_id]
-                detections = result['scan_result']['detections']
-                frame = self.masker.mask_frame(frame, detections, method='blur')
-
-            out.write(frame)
-            frame_id += 1
-
-        cap.release()
-        out.release()
+        def report(done):
+            progress('scanning', 0.1 + 0.8 * done / len(slice_files))
+
+        output_paths = [
+            os.path.join(processed_dir, f"processed_{os.path.basename(slice_file)}")
+            for slice_file in slice_files
+        ]
+
+        if self.workers > 1 and len(slice_files) > 1:
+            print(f"使用 {self.workers} 个进程并行处理 {len(slice_files)} 个切片")
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_process_slice_worker, slice_file, output_path)
+                for slice_file, output_path in zip(slice_files, output_paths)
+            ]
+            slice_results = []
+            try:
+                for future in futures:
+                    slice_results.append(future.result())
+                    report(len(slice_results))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            ocr_stats = _merge_ocr_stats([result['ocr_stats'] for result in slice_results])
+        else:
+            self.dlp_scanner.reset_stats()
+            slice_results = []
+            for slice_idx, (slice_file, output_path) in enumerate(zip(slice_files, output_paths)):
+                print(f"\n--- 处理切片 {slice_idx + 1}/{len(slice_files)}: {os.path.basename(slice_file)} ---")
+                # 单次解码：扫描关键帧并同时写出脱敏切片
+                slice_results.append(self.slice_processor.process(slice_file, output_path))
+                report(len(slice_results))
+            ocr_stats = self.dlp_scanner.get_stats()
+
+        for result, output_path in zip(slice_results, output_paths):
+            result['output_path'] = output_path
+
+        return slice_results, ocr_stats
+
+    def _get_executor(self):
+        """获取（懒加载）切片处理进程池"""
+        if self._executor is None:
+            self._executor = create_slice_executor(self.workers)
+        return self._executor
+
+    def close(self):
+        """关闭自建的切片处理进程池"""
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown()
+            self._executor = None
 
 
 def main():
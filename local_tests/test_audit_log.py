@@ -0,0 +1,48 @@
+"""
+审计日志压缩测试
+用本地目录模拟OBS，验证分片压缩结果以及列举失败时不覆盖已有审计文档
+
+运行: python -m pytest local_tests/test_audit_log.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.audit_log import audit_log_key, compact_audit_shards, write_audit_shard  # noqa: E402
+from shared.local_obs import LocalObsClient, _error  # noqa: E402
+from shared.obs_helper import OBSHelper  # noqa: E402
+
+
+def _entry(slice_index, frame_id, sensitive_type):
+    return {'slice_index': slice_index, 'frame_id': frame_id, 'type': sensitive_type}
+
+
+def test_compaction_sorts_and_indexes_shards(tmp_path):
+    obs_helper = OBSHelper(client=LocalObsClient(str(tmp_path)))
+    write_audit_shard(obs_helper, 'v1', 1, [_entry(1, 0, 'email')])
+    write_audit_shard(obs_helper, 'v1', 0, [_entry(0, 3, 'phone'), _entry(0, 1, 'email')])
+
+    audit_data = compact_audit_shards(obs_helper, 'v1', video_title='demo.mp4')
+
+    assert audit_data['video_title'] == 'demo.mp4'
+    assert audit_data['shard_count'] == 2
+    assert [(d['slice_index'], d['frame_id']) for d in audit_data['detections']] == [(0, 1), (0, 3), (1, 0)]
+    assert audit_data['index']['by_type'] == {'email': [0, 2], 'phone': [1]}
+
+
+def test_list_failure_keeps_existing_document(tmp_path, monkeypatch):
+    client = LocalObsClient(str(tmp_path))
+    obs_helper = OBSHelper(client=client)
+    write_audit_shard(obs_helper, 'v1', 0, [_entry(0, 0, 'phone')])
+    compact_audit_shards(obs_helper, 'v1')
+
+    monkeypatch.setattr(client, 'listObjects', lambda *args, **kwargs: _error(503, 'ServiceUnavailable', '服务繁忙'))
+    with pytest.raises(RuntimeError):
+        compact_audit_shards(obs_helper, 'v1')
+
+    resp = client.getObject(obs_helper.bucket_name, audit_log_key('v1'), loadStreamInMemory=True)
+    assert json.loads(resp.body.buffer)['total_detections'] == 1
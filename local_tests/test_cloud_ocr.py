@@ -0,0 +1,119 @@
+"""
+云端OCR测试
+在本机启动模拟的华为云OCR服务，通过OCR_ENDPOINT指向它，验证响应解析以及限流时的退避重试
+
+运行: python -m pytest local_tests/test_cloud_ocr.py
+"""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+pytest.importorskip('huaweicloudsdkocr')
+
+from shared import ocr_service  # noqa: E402
+from shared.config import Config  # noqa: E402
+from shared.ocr_dispatcher import OCRDispatcher  # noqa: E402
+from shared.ocr_service import OCRService  # noqa: E402
+
+WORDS_RESPONSE = {
+    'result': {
+        'words_block_count': 2,
+        'words_block_list': [
+            {'words': 'password: hunter2', 'confidence': 0.98,
+             'location': [[10, 20], [210, 20], [210, 50], [10, 50]]},
+            {'words': 'blurry', 'confidence': 0.2,
+             'location': [[10, 80], [90, 80], [90, 100], [10, 100]]}
+        ]
+    }
+}
+THROTTLED_RESPONSE = {'error_code': 'APIG.0308', 'error_msg': 'The request is throttled.'}
+
+
+class _StubOCRServer:
+    """模拟通用文字识别接口：先按throttle次数返回429，之后返回固定的识别结果"""
+
+    def __init__(self, throttle=0):
+        self.throttle = throttle
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.requests.append((self.path, body))
+                if len(stub.requests) <= stub.throttle:
+                    self._reply(429, THROTTLED_RESPONSE)
+                else:
+                    self._reply(200, WORDS_RESPONSE)
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _cloud_service(monkeypatch, endpoint):
+    monkeypatch.setattr(Config, 'OCR_ENDPOINT', endpoint)
+    monkeypatch.setattr(Config, 'OCR_PROJECT_ID', 'test-project')
+    monkeypatch.setattr(Config, 'HUAWEI_CLOUD_AK', 'test-ak')
+    monkeypatch.setattr(Config, 'HUAWEI_CLOUD_SK', 'test-sk')
+    monkeypatch.setattr(Config, 'OCR_CACHE_ENABLED', False)
+    monkeypatch.setattr(Config, 'OCR_CONFIDENCE_THRESHOLD', 0.6)
+    monkeypatch.setattr(ocr_service, '_huawei_client', None)
+
+    service = OCRService()
+    service.use_cloud = True
+    service._tesseract_ocr = lambda image: pytest.fail('不应降级到本地Tesseract')
+    return service
+
+
+def _image():
+    return np.full((120, 320, 3), 255, np.uint8)
+
+
+def test_cloud_response_is_parsed(monkeypatch):
+    with _StubOCRServer() as stub:
+        service = _cloud_service(monkeypatch, stub.endpoint)
+        results = service.extract_text(_image(), offset=(100, 200))
+
+    path, body = stub.requests[0]
+    assert path == '/v2/test-project/ocr/general-text'
+    assert body['image']
+    # 低于置信度阈值的文字被过滤，边界框换算到整帧坐标
+    assert results == [{'text': 'password: hunter2', 'confidence': 0.98, 'bbox': (110, 220, 200, 30)}]
+
+
+def test_throttled_requests_are_retried(monkeypatch):
+    with _StubOCRServer(throttle=2) as stub:
+        service = _cloud_service(monkeypatch, stub.endpoint)
+        dispatcher = OCRDispatcher(service, concurrency=1, max_retries=3, backoff=0.01)
+        results = dispatcher.submit(_image()).result()
+
+    assert len(stub.requests) == 3
+    assert [item['text'] for item in results] == ['password: hunter2']
+    assert dispatcher.get_stats() == {'requests': 3, 'throttled': 2, 'retries': 2}
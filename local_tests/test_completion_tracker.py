@@ -0,0 +1,70 @@
+"""
+切片完成跟踪测试
+并发登记时只有一次调用获得合并触发权，重复登记的切片只计一次，交还触发权后可以再次触发
+
+运行: python -m pytest local_tests/test_completion_tracker.py
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.completion_tracker import LocalCompletionTracker, OBSCompletionTracker  # noqa: E402
+from shared.local_obs import LocalObsClient  # noqa: E402
+from shared.obs_helper import OBSHelper  # noqa: E402
+
+TOTAL_SLICES = 8
+
+
+@pytest.fixture(params=['local', 'obs'])
+def tracker(request, tmp_path):
+    if request.param == 'local':
+        return LocalCompletionTracker(str(tmp_path / 'markers'))
+    return OBSCompletionTracker(OBSHelper(client=LocalObsClient(str(tmp_path / 'obs'))))
+
+
+def _mark_concurrently(tracker, slice_indexes):
+    """所有线程就绪后同时登记，返回获得触发权的调用次数"""
+    barrier = threading.Barrier(len(slice_indexes))
+    triggered = []
+
+    def mark(slice_index):
+        barrier.wait()
+        if tracker.mark_done('video-1', slice_index, TOTAL_SLICES):
+            triggered.append(slice_index)
+
+    threads = [threading.Thread(target=mark, args=(index,)) for index in slice_indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(triggered)
+
+
+def test_concurrent_completions_trigger_merge_once(tracker):
+    # 每个切片登记两次(模拟函数重试)
+    assert _mark_concurrently(tracker, list(range(TOTAL_SLICES)) * 2) == 1
+    assert not tracker.mark_done('video-1', 0, TOTAL_SLICES)
+
+
+def test_duplicate_slice_is_counted_once(tracker):
+    for _ in range(TOTAL_SLICES):
+        assert not tracker.mark_done('video-1', 0, TOTAL_SLICES)
+    for index in range(1, TOTAL_SLICES - 1):
+        assert not tracker.mark_done('video-1', index, TOTAL_SLICES)
+
+    assert tracker.mark_done('video-1', TOTAL_SLICES - 1, TOTAL_SLICES)
+
+
+def test_released_barrier_can_be_won_again(tracker):
+    for index in range(TOTAL_SLICES - 1):
+        tracker.mark_done('video-1', index, TOTAL_SLICES)
+    assert tracker.mark_done('video-1', TOTAL_SLICES - 1, TOTAL_SLICES)
+
+    tracker.release('video-1')
+
+    assert tracker.mark_done('video-1', 3, TOTAL_SLICES)
+    assert not tracker.mark_done('video-1', 4, TOTAL_SLICES)
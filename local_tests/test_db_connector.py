@@ -0,0 +1,168 @@
+"""
+数据库连接池与批量插入测试
+用假连接替换pymysql.connect，验证连接池耗尽时的超时、异常时连接的归还，以及批量插入与逐行插入写入的数据一致
+
+运行: python -m pytest local_tests/test_db_connector.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+pymysql = pytest.importorskip('pymysql')
+
+from shared import db_connector  # noqa: E402
+from shared.db_connector import AuditLogDAO, ConnectionPool, DatabaseConnector  # noqa: E402
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.conn.statements.append(('execute', ' '.join(sql.split()), [tuple(params)]))
+        self.conn.rows.append(tuple(params))
+        self.lastrowid = len(self.conn.rows)
+        return 1
+
+    def executemany(self, sql, params_list):
+        params_list = [tuple(params) for params in params_list]
+        self.conn.statements.append(('executemany', ' '.join(sql.split()), params_list))
+        self.conn.rows.extend(params_list)
+        return len(params_list)
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.rows = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=True):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """记录连接池创建的所有假连接"""
+    created = []
+
+    def connect(**kwargs):
+        conn = _FakeConnection()
+        created.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_connector.pymysql, 'connect', connect)
+    return created
+
+
+def _connector(size=2, timeout=0.05):
+    db = DatabaseConnector.__new__(DatabaseConnector)
+    db.config = {}
+    db.pool = ConnectionPool({}, size=size, max_lifetime=3600, timeout=timeout, ping_interval=30)
+    return db
+
+
+def test_exhausted_pool_times_out_and_recovers(connections):
+    pool = _connector(size=2).pool
+    first = pool.acquire()
+    pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert pool.get_stats()['timeouts'] == 1
+
+    pool.release(*first)
+    conn, _ = pool.acquire()
+    assert conn is first[0]
+    assert len(connections) == 2
+
+
+def test_connection_is_returned_when_the_block_raises(connections):
+    db = _connector(size=1)
+
+    with pytest.raises(ValueError):
+        with db.get_connection():
+            raise ValueError('boom')
+
+    conn = connections[0]
+    assert conn.rollbacks == 1 and conn.commits == 0 and not conn.closed
+    # 唯一的连接已归还，可以再次取出(不会因槽位泄漏而超时)
+    with db.get_connection() as again:
+        assert again is conn
+
+
+def test_broken_connection_is_discarded_and_slot_released(connections):
+    db = _connector(size=1)
+
+    with pytest.raises(pymysql.err.OperationalError):
+        with db.get_connection():
+            raise pymysql.err.OperationalError(2013, 'Lost connection')
+
+    assert connections[0].closed
+    with db.get_connection() as conn:
+        assert conn is connections[1]
+    assert db.pool.get_stats()['discarded'] == 1
+
+
+def _audit_logs(count):
+    return [{
+        'video_id': 'video-1', 'slice_index': i // 10, 'frame_id': i, 'timestamp_in_video': i * 0.5,
+        'sensitive_type': 'phone' if i % 2 else 'email', 'detected_text': f"text-{i}", 'confidence': 0.9,
+        'bbox_x': i, 'bbox_y': 2 * i, 'bbox_width': 30, 'bbox_height': 12
+    } for i in range(count)]
+
+
+def _dao(db):
+    dao = AuditLogDAO.__new__(AuditLogDAO)
+    dao.db = db
+    return dao
+
+
+def test_bulk_insert_writes_the_same_rows_as_row_by_row(connections):
+    logs = _audit_logs(1203)
+
+    row_by_row = _dao(_connector(size=1))
+    for log in logs:
+        row_by_row.create_audit_log(**log)
+    single_rows = connections[0].rows
+    single_sql = {sql for _, sql, _ in connections[0].statements}
+
+    bulk = _dao(_connector(size=1))
+    assert bulk.create_audit_logs_bulk(logs, batch_size=500) == len(logs)
+    bulk_conn = connections[1]
+
+    assert bulk_conn.rows == single_rows
+    assert {sql for _, sql, _ in bulk_conn.statements} == single_sql
+    # 分三批执行，同一个事务内一次提交
+    assert [len(rows) for kind, _, rows in bulk_conn.statements] == [500, 500, 203]
+    assert all(kind == 'executemany' for kind, _, _ in bulk_conn.statements)
+    assert bulk_conn.commits == 1
+
+
+def test_bulk_insert_of_nothing_does_not_touch_the_database(connections):
+    assert _dao(_connector()).create_audit_logs_bulk([]) == 0
+    assert connections == []
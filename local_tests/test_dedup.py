@@ -0,0 +1,69 @@
+"""
+内容去重测试
+相同内容在相同DLP配置下命中已有结果，内容或影响输出的配置变化时不命中
+
+运行: python -m pytest local_tests/test_dedup.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.config import Config  # noqa: E402
+from shared.dedup import LocalDedupIndex, dlp_config_fingerprint, file_sha256  # noqa: E402
+
+
+@pytest.fixture
+def processed(tmp_path):
+    """一个已处理并登记到索引的视频，返回(索引, 内容哈希)"""
+    video_path = tmp_path / 'upload.mp4'
+    video_path.write_bytes(b'video-bytes' * 1000)
+    output_path = tmp_path / 'sanitized.mp4'
+    output_path.write_bytes(b'sanitized')
+
+    index = LocalDedupIndex(str(tmp_path / 'dedup_index.json'))
+    content_hash = file_sha256(str(video_path))
+    index.record(content_hash, dlp_config_fingerprint(), 'video-1', str(output_path), sensitive_count=2)
+    return index, content_hash
+
+
+def test_same_bytes_and_config_are_deduplicated(tmp_path, processed):
+    index, _ = processed
+    copy_path = tmp_path / 'reupload.mp4'
+    copy_path.write_bytes(b'video-bytes' * 1000)
+
+    entry = index.lookup(file_sha256(str(copy_path)), dlp_config_fingerprint())
+
+    assert entry['video_id'] == 'video-1'
+    assert entry['sensitive_count'] == 2
+
+
+def test_different_bytes_are_not_deduplicated(tmp_path, processed):
+    index, _ = processed
+    other_path = tmp_path / 'other.mp4'
+    other_path.write_bytes(b'video-bytes' * 999 + b'changed')
+
+    assert index.lookup(file_sha256(str(other_path)), dlp_config_fingerprint()) is None
+
+
+@pytest.mark.parametrize('name, value', [
+    ('OCR_TARGET_TEXT_HEIGHT', 24),
+    ('OCR_CONFIDENCE_THRESHOLD', 0.8),
+    ('SAMPLE_INTERVAL', 0.5),
+    ('TEXT_DETECT_ENABLED', False),
+    ('BLUR_INTENSITY', 31)
+])
+def test_config_change_is_not_deduplicated(monkeypatch, processed, name, value):
+    index, content_hash = processed
+    monkeypatch.setattr(Config, name, value)
+
+    assert index.lookup(content_hash, dlp_config_fingerprint()) is None
+
+
+def test_deleted_output_is_not_reused(processed):
+    index, content_hash = processed
+    os.remove(index.lookup(content_hash, dlp_config_fingerprint())['output_path'])
+
+    assert index.lookup(content_hash, dlp_config_fingerprint()) is None
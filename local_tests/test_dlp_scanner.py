@@ -0,0 +1,141 @@
+"""
+DLP扫描回归测试
+用桩替换Tesseract识别(按画面上绘制的单词返回结果)，验证增量OCR沿用的旧单词与新识别的单词能拼成同一行，
+以及文字区域检测不把一行拆成多个识别区域
+
+运行: python -m pytest local_tests/test_dlp_scanner.py
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.config import Config  # noqa: E402
+from shared.dlp_scanner import DLPScanner  # noqa: E402
+from shared.ocr_dispatcher import OCRDispatcher  # noqa: E402
+from shared.text_detect import TextRegionDetector  # noqa: E402
+from shared.text_lines import group_ocr_lines  # noqa: E402
+
+FRAME_SIZE = (720, 1280)
+WORD_HEIGHT = 30
+
+
+def _layout(lines):
+    """
+    把文本行排版为单词及其整帧坐标
+    :param lines: [(y, ['word', ...]), ...]
+    :return: [{'text', 'bbox', 'line'}, ...]，line为Tesseract风格的(block, par, line)编号
+    """
+    words = []
+    for line_num, (y, texts) in enumerate(lines, start=1):
+        x = 40
+        for text in texts:
+            (width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
+            words.append({'text': text, 'bbox': (x, y, width, WORD_HEIGHT), 'line': (1, 1, line_num)})
+            x += width + 20
+    return words
+
+
+def _render(words):
+    frame = np.full(FRAME_SIZE + (3,), 20, np.uint8)
+    for word in words:
+        x, y, _, h = word['bbox']
+        cv2.putText(frame, word['text'], (x, y + h - 6), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+    return frame
+
+
+class _FakeTesseract:
+    """按当前帧的排版返回落在送入图像内的单词(坐标换算为图像内坐标)"""
+
+    def __init__(self):
+        self.frame = None
+        self.words = []
+        self.calls = 0
+
+    def __call__(self, image):
+        self.calls += 1
+        source = self.frame if image.ndim == 3 else cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        _, _, _, (left, top) = cv2.minMaxLoc(cv2.matchTemplate(source, image, cv2.TM_CCORR_NORMED))
+        height, width = image.shape[:2]
+
+        results = []
+        for word in self.words:
+            x, y, w, h = word['bbox']
+            if left <= x and top <= y and x + w <= left + width and y + h <= top + height:
+                results.append({
+                    'text': word['text'],
+                    'confidence': 0.95,
+                    'bbox': (x - left, y - top, w, h),
+                    'line': word['line']
+                })
+        return results
+
+
+def _make_scanner(monkeypatch):
+    monkeypatch.setattr(Config, 'OCR_CACHE_ENABLED', False)
+    monkeypatch.setattr(Config, 'OCR_SKIP_UNCHANGED', True)
+    monkeypatch.setattr(Config, 'OCR_INCREMENTAL', True)
+    monkeypatch.setattr(Config, 'OCR_TARGET_TEXT_HEIGHT', 0)
+
+    scanner = DLPScanner()
+    fake = _FakeTesseract()
+    scanner.ocr_service.use_cloud = False
+    scanner.ocr_service._tesseract_ocr = fake
+    scanner.dispatcher = OCRDispatcher(scanner.ocr_service, concurrency=1)
+    return scanner, fake
+
+
+def _scan(scanner, fake, lines):
+    fake.words = _layout(lines)
+    fake.frame = _render(fake.words)
+    return scanner.scan_frame(fake.frame)
+
+
+def test_incremental_ocr_keeps_carried_words_on_their_line(monkeypatch):
+    scanner, fake = _make_scanner(monkeypatch)
+
+    first = _scan(scanner, fake, [
+        (100, ['password:', 'hunter2']),
+        (300, ['card', '4111', '1111', '1111', '1111'])
+    ])
+    assert first['ocr_mode'] in ('full', 'text_roi')
+    assert {d['sensitive_type'] for d in first['detections']} >= {'password', 'credit_card'}
+
+    # 只有值发生变化：走区域增量OCR，标签和卡号前几段沿用上一帧的识别结果
+    second = _scan(scanner, fake, [
+        (100, ['password:', 'swordfish']),
+        (300, ['card', '4111', '1111', '1111', '2222'])
+    ])
+    assert second['ocr_mode'] == 'partial'
+    matched = {d['sensitive_type']: d['matched_text'] for d in second['detections']}
+    assert matched.get('password') == 'password: swordfish'
+    assert matched.get('credit_card') == '4111 1111 1111 2222'
+
+
+def test_lines_from_different_calls_are_joined_by_geometry():
+    carried = {'text': 'password:', 'confidence': 0.9, 'bbox': (40, 100, 150, 30), 'line': (0, 1, 1, 1)}
+    fresh = {'text': 'hunter2', 'confidence': 0.9, 'bbox': (210, 102, 120, 28), 'line': (1, 1, 1, 1)}
+    other = {'text': 'unrelated', 'confidence': 0.9, 'bbox': (40, 300, 150, 30), 'line': (1, 1, 1, 2)}
+
+    lines = group_ocr_lines([fresh, other, carried])
+
+    assert sorted(line['text'] for line in lines) == ['password: hunter2', 'unrelated']
+
+
+def test_text_regions_keep_a_line_together():
+    words = [
+        {'text': 'password:', 'bbox': (40, 100, 0, WORD_HEIGHT)},
+        {'text': 'hunter2', 'bbox': (260, 100, 0, WORD_HEIGHT)},
+        {'text': 'far', 'bbox': (900, 100, 0, WORD_HEIGHT)},
+        {'text': 'unrelated', 'bbox': (40, 300, 0, WORD_HEIGHT)}
+    ]
+
+    regions = sorted(TextRegionDetector(padding=8).detect(_render(words)))
+
+    # 词间距超出闭运算范围的同一行合为一个区域，远处的单词和其它行保持独立
+    assert len(regions) == 3
+    first = next(r for r in regions if r[1] < 200 and r[0] < 100)
+    assert first[0] <= 40 and first[2] >= 360
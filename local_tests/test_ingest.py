@@ -0,0 +1,34 @@
+"""
+分块续传测试
+验证续传会话的总大小受上限约束，写入的数据不超过声明的大小
+
+运行: python -m pytest local_tests/test_ingest.py
+"""
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+pytest.importorskip('flask')
+
+from backend.ingest import ResumableUploads  # noqa: E402
+
+
+@pytest.mark.parametrize('size', [0, -1, 1025])
+def test_create_rejects_invalid_or_oversized_sessions(tmp_path, size):
+    uploads = ResumableUploads(str(tmp_path), max_size=1024)
+    with pytest.raises(ValueError):
+        uploads.create('demo.mp4', size)
+
+
+def test_chunks_never_exceed_declared_size(tmp_path):
+    uploads = ResumableUploads(str(tmp_path), max_size=1024)
+    upload_id = uploads.create('demo.mp4', 100)['upload_id']
+
+    upload = uploads.write_chunk(upload_id, 0, io.BytesIO(b'x' * 4096))
+
+    assert upload['offset'] == 100
+    assert upload['complete']
@@ -0,0 +1,51 @@
+"""
+后台任务队列测试
+多个队列实例(模拟多个进程)共用同一个数据库时，每个任务只能被领取一次
+
+运行: python -m pytest local_tests/test_job_queue.py
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.job_queue import JobQueue  # noqa: E402
+
+
+def test_each_job_is_claimed_once_across_queues(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    queues = [JobQueue(db_path, handler=None, start=False) for _ in range(2)]
+    job_ids = [queues[0].submit({'index': i}) for i in range(40)]
+
+    claimed = []
+    claimed_lock = threading.Lock()
+
+    def drain(queue):
+        while True:
+            job = queue._claim_next()
+            if job is None:
+                return
+            with claimed_lock:
+                claimed.append(job['job_id'])
+
+    threads = [threading.Thread(target=drain, args=(queue,)) for queue in queues for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+    assert all(job['status'] == JobQueue.STATUS_RUNNING for job in queues[1].list_jobs(limit=100))
+
+
+def test_queue_without_start_does_not_requeue_running_jobs(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    serving = JobQueue(db_path, handler=None, start=False)
+    job_id = serving.submit({})
+    serving._claim_next()
+
+    # 不处理任务的进程(如重载器的父进程)打开同一个数据库，不应把正在执行的任务放回队列
+    JobQueue(db_path, handler=None, start=False)
+
+    assert serving.get(job_id)['status'] == JobQueue.STATUS_RUNNING
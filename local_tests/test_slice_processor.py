@@ -0,0 +1,91 @@
+"""
+流式切片处理回归测试
+用桩替换扫描器(按帧上的标记判断是否敏感)，验证延迟写出的补写量受上限约束且输出帧完整
+
+运行: python -m pytest local_tests/test_slice_processor.py
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.slice_processor import StreamingSliceProcessor  # noqa: E402
+
+FPS = 10
+FRAME_COUNT = 60
+SENSITIVE_FROM = 40
+
+
+class _DoneScan:
+    def __init__(self, result):
+        self._result = result
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._result
+
+
+class _MarkerScanner:
+    """帧的亮度超过阈值时视为敏感"""
+    max_in_flight = 4
+
+    def submit_frame(self, frame):
+        sensitive = frame.mean() > 127
+        detections = [{'bbox': (0, 0, 8, 8)}] if sensitive else []
+        return _DoneScan({'sensitive_count': len(detections), 'detections': detections})
+
+
+class _NoopMasker:
+    def mask_frame(self, frame, detections, method='blur'):
+        return frame
+
+
+def _write_video(path):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (64, 48))
+    for index in range(FRAME_COUNT):
+        writer.write(np.full((48, 64, 3), 200 if index >= SENSITIVE_FROM else 20, np.uint8))
+    writer.release()
+
+
+def _count_frames(path):
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+def _process(tmp_path, monkeypatch, max_prefix_seconds):
+    input_path = str(tmp_path / 'slice.mp4')
+    output_path = str(tmp_path / 'processed.mp4')
+    _write_video(input_path)
+
+    processor = StreamingSliceProcessor(_MarkerScanner(), _NoopMasker(), interval=0.5,
+                                        max_prefix_seconds=max_prefix_seconds)
+    prefixes = []
+    copy_prefix = processor._copy_prefix
+    monkeypatch.setattr(processor, '_copy_prefix', lambda *args: prefixes.append(args[2]) or copy_prefix(*args))
+    return processor.process(input_path, output_path), output_path, prefixes
+
+
+def test_late_finding_rewrites_at_most_the_prefix_limit(tmp_path, monkeypatch):
+    result, output_path, prefixes = _process(tmp_path, monkeypatch, max_prefix_seconds=1)
+
+    assert result['masked']
+    assert result['scan_results'][0]['frame_id'] == SENSITIVE_FROM // 5
+    assert prefixes == [FPS]
+    assert _count_frames(output_path) == FRAME_COUNT
+
+
+def test_unlimited_prefix_rewrites_up_to_the_first_finding(tmp_path, monkeypatch):
+    result, output_path, prefixes = _process(tmp_path, monkeypatch, max_prefix_seconds=0)
+
+    assert result['masked']
+    assert prefixes == [SENSITIVE_FROM]
+    assert _count_frames(output_path) == FRAME_COUNT
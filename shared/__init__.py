@@ -11,5 +11,18 @@ __all__ = [
     'obs_helper',
     'db_connector',
     'ocr_service',
-    'video_processing_service'
+    'video_processing_service',
+    'slice_processor',
+    'frame_diff',
+    'ocr_cache',
+    'text_lines',
+    'dedup',
+    'completion_tracker',
+    'audit_log',
+    'local_obs',
+    'metrics',
+    'ocr_dispatcher',
+    'ocr_preprocess',
+    'tesseract_pool',
+    'text_detect'
 ]
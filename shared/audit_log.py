@@ -0,0 +1,149 @@
+"""
+OBS审计日志模块
+每个DLP扫描函数把本切片的检测结果写成一个不可变的分片 logs/{video_id}/slice_{i}.jsonl，
+合并函数再把所有分片压缩成一份带索引的审计文档 logs/{video_id}_audit.json，
+避免并行切片对同一个JSON反复下载-追加-上传
+"""
+import os
+import json
+import tempfile
+from datetime import datetime
+
+
+def audit_shard_prefix(video_id):
+    """切片审计分片的OBS前缀"""
+    return f"logs/{video_id}/slice_"
+
+
+def audit_log_key(video_id):
+    """压缩后审计文档的OBS键"""
+    return f"logs/{video_id}_audit.json"
+
+
+def build_audit_entries(scan_results, slice_index, slice_start=0.0):
+    """
+    将切片扫描结果转换为审计记录
+    :param scan_results: StreamingSliceProcessor返回的scan_results
+    :param slice_index: 切片索引
+    :param slice_start: 切片在原视频中的起始时间(秒)
+    :return: 审计记录列表
+    """
+    entries = []
+    for result in scan_results:
+        for detection in result['scan_result']['detections']:
+            bbox = detection['bbox']
+            entries.append({
+                'slice_index': slice_index,
+                'frame_id': result['frame_id'],
+                'timestamp': result['timestamp'],
+                'video_timestamp': slice_start + result['timestamp'],
+                'type': detection['sensitive_type'],
+                'text': detection['ocr_text'][:100] if detection.get('ocr_text') else '',
+                'confidence': detection.get('ocr_confidence', 0),
+                'bbox': {
+                    'x': bbox[0],
+                    'y': bbox[1],
+                    'width': bbox[2],
+                    'height': bbox[3]
+                }
+            })
+    return entries
+
+
+def write_audit_shard(obs_helper, video_id, slice_index, entries):
+    """
+    上传切片审计分片(JSON Lines，每行一条记录)
+    分片键由切片索引唯一确定，重试时整体覆盖，不与其他切片竞争
+    :return: 分片的OBS键，上传失败返回None
+    """
+    shard_key = f"{audit_shard_prefix(video_id)}{slice_index:04d}.jsonl"
+    content = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+    if not obs_helper.put_content(shard_key, content.encode('utf-8')):
+        return None
+    return shard_key
+
+
+def compact_audit_shards(obs_helper, video_id, video_title=None):
+    """
+    把视频的所有审计分片压缩为一份审计文档并上传
+    检测记录按(切片, 帧)排序，并附带按类型和按切片的索引(记录下标)，便于查询时直接定位；
+    列举或下载分片失败时抛出异常，不会用不完整的结果覆盖已有的审计文档
+    :param obs_helper: OBSHelper实例
+    :param video_id: 视频ID
+    :param video_title: 视频标题
+    :return: 审计文档dict
+    """
+    shards = sorted(
+        (obj['key'], obj['size'])
+        for obj in obs_helper.iter_objects(prefix=audit_shard_prefix(video_id), with_metadata=True)
+        if obj['key'].endswith('.jsonl')
+    )
+
+    detections = []
+    temp_dir = tempfile.mkdtemp(prefix=f"audit_{video_id}_")
+    try:
+        for shard_key, size in shards:
+            local_path = os.path.join(temp_dir, os.path.basename(shard_key))
+            if not obs_helper.download_file(shard_key, local_path, size=size) or not os.path.exists(local_path):
+                raise RuntimeError(f"下载审计分片失败: {shard_key}")
+            with open(local_path, 'r', encoding='utf-8') as f:
+                detections.extend(json.loads(line) for line in f if line.strip())
+
+        detections.sort(key=lambda entry: (entry['slice_index'], entry['frame_id']))
+
+        by_type = {}
+        by_slice = {}
+        for i, entry in enumerate(detections):
+            by_type.setdefault(entry['type'], []).append(i)
+            by_slice.setdefault(str(entry['slice_index']), []).append(i)
+
+        audit_data = {
+            'video_id': video_id,
+            'video_title': video_title or video_id,
+            'detections': detections,
+            'total_detections': len(detections),
+            'index': {
+                'by_type': by_type,
+                'by_slice': by_slice
+            },
+            'shard_count': len(shards),
+            'processed_at': datetime.now().isoformat()
+        }
+
+        content = json.dumps(audit_data, ensure_ascii=False, indent=2).encode('utf-8')
+        if not obs_helper.put_content(audit_log_key(video_id), content):
+            raise RuntimeError(f"上传审计文档失败: {audit_log_key(video_id)}")
+        return audit_data
+    finally:
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
+
+
+def alias_audit_log(obs_helper, source_video_id, video_id):
+    """
+    为内容重复的视频生成审计文档：复制已处理视频的审计文档到新视频的键下，
+    video_id改为新视频并记录duplicate_of，读取方按新视频ID即可找到
+    :param obs_helper: OBSHelper实例
+    :param source_video_id: 已处理的相同内容视频ID
+    :param video_id: 新视频ID
+    :return: 审计文档dict
+    """
+    temp_dir = tempfile.mkdtemp(prefix=f"audit_{video_id}_")
+    local_path = os.path.join(temp_dir, 'audit.json')
+    try:
+        if not obs_helper.download_file(audit_log_key(source_video_id), local_path) or not os.path.exists(local_path):
+            raise RuntimeError(f"下载审计文档失败: {audit_log_key(source_video_id)}")
+        with open(local_path, 'r', encoding='utf-8') as f:
+            audit_data = json.load(f)
+
+        audit_data['video_id'] = video_id
+        audit_data['duplicate_of'] = source_video_id
+        content = json.dumps(audit_data, ensure_ascii=False, indent=2).encode('utf-8')
+        if not obs_helper.put_content(audit_log_key(video_id), content):
+            raise RuntimeError(f"上传审计文档失败: {audit_log_key(video_id)}")
+        return audit_data
+    finally:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        os.rmdir(temp_dir)
@@ -0,0 +1,161 @@
+"""
+切片完成跟踪模块
+DLP扫描函数异步并行执行、完成顺序不确定，由完成跟踪器判断"最后一个切片"：
+每个切片完成时登记一次(重复登记不计数)，登记使全部切片完成的那一次调用获得合并触发权，且只有一次调用能获得；
+触发合并失败时调用release交还触发权，之后重新执行任一切片即可再次触发
+"""
+import os
+from abc import ABC, abstractmethod
+from shared.config import Config
+
+
+class CompletionTracker(ABC):
+    """完成跟踪器接口"""
+
+    @abstractmethod
+    def mark_done(self, video_id, slice_index, total_slices):
+        """
+        登记切片完成
+        :param video_id: 视频ID
+        :param slice_index: 切片索引
+        :param total_slices: 切片总数
+        :return: 本次调用是否应触发合并(触发权被release交还之前，每个视频至多返回一次True)
+        """
+
+    @abstractmethod
+    def release(self, video_id):
+        """
+        交还合并触发权(触发合并失败时调用)，切片完成登记保留
+        :param video_id: 视频ID
+        """
+
+
+class DatabaseCompletionTracker(CompletionTracker):
+    """
+    基于数据库的完成跟踪
+    slice_completions 的主键保证每个切片只计数一次，merge_barriers.done_slices 原子自增，
+    merge_triggered 条件更新保证只有一次调用获得触发权
+    """
+
+    def __init__(self):
+        from shared.db_connector import DatabaseConnector
+        self.db = DatabaseConnector()
+
+    def mark_done(self, video_id, slice_index, total_slices):
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO merge_barriers (video_id, total_slices) VALUES (%s, %s) "
+                    "ON DUPLICATE KEY UPDATE video_id = video_id",
+                    (video_id, total_slices)
+                )
+                is_new = cursor.execute(
+                    "INSERT IGNORE INTO slice_completions (video_id, slice_index) VALUES (%s, %s)",
+                    (video_id, slice_index)
+                )
+                if is_new:
+                    cursor.execute(
+                        "UPDATE merge_barriers SET done_slices = done_slices + 1 WHERE video_id = %s",
+                        (video_id,)
+                    )
+                return cursor.execute(
+                    "UPDATE merge_barriers SET merge_triggered = 1, triggered_at = NOW() "
+                    "WHERE video_id = %s AND done_slices >= total_slices AND merge_triggered = 0",
+                    (video_id,)
+                ) == 1
+
+    def release(self, video_id):
+        self.db.execute_update(
+            "UPDATE merge_barriers SET merge_triggered = 0, triggered_at = NULL WHERE video_id = %s",
+            (video_id,)
+        )
+
+
+class OBSCompletionTracker(CompletionTracker):
+    """
+    基于OBS的完成跟踪
+    每个切片写一个完成标记对象(幂等)，标记数达到总数后，用 position=0 的追加写抢占合并锁对象，
+    OBS的追加写位置校验保证只有一个调用者成功
+    """
+
+    def __init__(self, obs_helper=None, prefix='markers/'):
+        """
+        :param obs_helper: OBSHelper实例
+        :param prefix: 标记对象前缀
+        """
+        if obs_helper is None:
+            from shared.obs_helper import OBSHelper
+            obs_helper = OBSHelper()
+        self.obs_helper = obs_helper
+        self.prefix = prefix
+
+    def mark_done(self, video_id, slice_index, total_slices):
+        marker_prefix = f"{self.prefix}{video_id}/slice_"
+        if not self.obs_helper.put_content(f"{marker_prefix}{slice_index:04d}.done", str(slice_index)):
+            raise RuntimeError(f"写入切片完成标记失败: {video_id}/{slice_index}")
+
+        # 列举失败时抛出异常(list_objects会返回空列表)，否则最后完成的切片会错过触发，视频永远不会合并
+        done = [key for key in self.obs_helper.iter_objects(prefix=marker_prefix) if key.endswith('.done')]
+        if len(done) < total_slices:
+            return False
+
+        return self.obs_helper.append_object(f"{self.prefix}{video_id}/merge.lock", str(slice_index), position=0)
+
+    def release(self, video_id):
+        if not self.obs_helper.delete_object(f"{self.prefix}{video_id}/merge.lock"):
+            raise RuntimeError(f"释放合并锁失败: {video_id}")
+
+
+class LocalCompletionTracker(CompletionTracker):
+    """
+    基于本地文件的完成跟踪(本地测试用)
+    切片完成标记为文件，合并锁用 O_CREAT|O_EXCL 独占创建
+    """
+
+    def __init__(self, base_dir=None):
+        """
+        :param base_dir: 标记文件目录
+        """
+        self.base_dir = base_dir or os.path.join(Config.LOCAL_STORAGE_PATH, 'markers')
+
+    def mark_done(self, video_id, slice_index, total_slices):
+        video_dir = os.path.join(self.base_dir, video_id)
+        os.makedirs(video_dir, exist_ok=True)
+        open(os.path.join(video_dir, f"slice_{slice_index:04d}.done"), 'w').close()
+
+        done = [name for name in os.listdir(video_dir) if name.endswith('.done')]
+        if len(done) < total_slices:
+            return False
+
+        try:
+            fd = os.open(os.path.join(video_dir, 'merge.lock'), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def release(self, video_id):
+        lock_path = os.path.join(self.base_dir, video_id, 'merge.lock')
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+
+
+def get_completion_tracker():
+    """
+    根据配置创建完成跟踪器
+    COMPLETION_TRACKER=auto 时：配置了数据库则用数据库，云端模式用OBS，本地模式用本地文件
+    """
+    backend = Config.COMPLETION_TRACKER
+    if backend == 'auto':
+        if os.getenv('DB_HOST') and os.getenv('DB_PASSWORD'):
+            backend = 'db'
+        elif not Config.LOCAL_MODE:
+            backend = 'obs'
+        else:
+            backend = 'local'
+
+    if backend == 'db':
+        return DatabaseCompletionTracker()
+    if backend == 'obs':
+        return OBSCompletionTracker()
+    return LocalCompletionTracker()
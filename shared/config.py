@@ -20,6 +20,12 @@ class Config:
     # OBS对象存储配置
     OBS_BUCKET_NAME = os.getenv('OBS_BUCKET_NAME', 'video-vault-storage')
     OBS_ENDPOINT = os.getenv('OBS_ENDPOINT', 'obs.cn-north-4.myhuaweicloud.com')
+    OBS_PART_SIZE = int(os.getenv('OBS_PART_SIZE', str(16 * 1024 * 1024)))  # 分段传输的分段大小(字节)
+    OBS_TASK_NUM = int(os.getenv('OBS_TASK_NUM', '4'))  # 分段传输的并发数
+    OBS_MULTIPART_THRESHOLD = int(os.getenv('OBS_MULTIPART_THRESHOLD', str(32 * 1024 * 1024)))  # 超过该大小使用分段上传
+    OBS_ENABLE_CHECKPOINT = os.getenv('OBS_ENABLE_CHECKPOINT', 'true').lower() == 'true'  # 分段传输断点续传
+    OBS_BATCH_WORKERS = int(os.getenv('OBS_BATCH_WORKERS', '8'))  # 批量上传/下载的并发对象数
+    OBS_LOCAL_STANDIN = os.getenv('OBS_LOCAL_STANDIN', 'false').lower() == 'true'  # 本地模式用本地目录模拟OBS(默认只打印模拟日志)
 
     # RDS数据库配置
     DB_HOST = os.getenv('DB_HOST', 'localhost')
@@ -27,6 +33,10 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'video_vault')
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))  # 连接池最大连接数
+    DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', '3600'))  # 连接最大存活时间(秒)
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # 等待空闲连接的超时时间(秒)
+    DB_POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', '30'))  # 空闲超过该时间(秒)的连接取出时先ping
 
     # AI大模型API配置
     LLM_API_KEY = os.getenv('LLM_API_KEY', '')
@@ -34,8 +44,16 @@ class Config:
     LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4')
 
     # 华为云OCR服务配置
-    OCR_ENDPOINT = os.getenv('OCR_ENDPOINT', 'https://ocr.cn-north-4.myhuaweicloud.com')
+    OCR_ENDPOINT = os.getenv('OCR_ENDPOINT', '')  # OCR服务地址，为空时按HUAWEI_CLOUD_REGION取官方地址
     OCR_PROJECT_ID = os.getenv('OCR_PROJECT_ID', '')
+    OCR_CONNECT_TIMEOUT = float(os.getenv('OCR_CONNECT_TIMEOUT', '5'))  # 建立连接超时(秒)
+    OCR_READ_TIMEOUT = float(os.getenv('OCR_READ_TIMEOUT', '30'))  # 读取响应超时(秒)
+    OCR_HTTP_POOL_SIZE = int(os.getenv('OCR_HTTP_POOL_SIZE', '10'))  # HTTP连接池大小
+    OCR_CONCURRENCY = int(os.getenv('OCR_CONCURRENCY', '4'))  # 同时在途的云端OCR请求数
+    OCR_RATE_LIMIT = float(os.getenv('OCR_RATE_LIMIT', '10'))  # 每秒请求数上限(与API配额一致)，0为不限速
+    OCR_RATE_BURST = int(os.getenv('OCR_RATE_BURST', '0'))  # 允许的突发请求数，0时等于速率
+    OCR_MAX_RETRIES = int(os.getenv('OCR_MAX_RETRIES', '4'))  # 被限流时的最大重试次数
+    OCR_RETRY_BACKOFF = float(os.getenv('OCR_RETRY_BACKOFF', '0.5'))  # 限流重试的首次退避时间(秒)
 
     # 本地测试配置
     LOCAL_MODE = os.getenv('LOCAL_MODE', 'true').lower() == 'true'
@@ -43,9 +61,56 @@ class Config:
 
     # DLP配置
     SLICE_DURATION = int(os.getenv('SLICE_DURATION', '60'))  # 视频切片时长(秒)
+    SLICE_MODE = os.getenv('SLICE_MODE', 'copy')  # 切片方式: copy(FFmpeg流复制) / reencode(OpenCV重编码)
+    SAMPLE_INTERVAL = float(os.getenv('SAMPLE_INTERVAL', '1.0'))  # 采样扫描的间隔(秒)
+    LAZY_WRITE_MAX_SECONDS = float(os.getenv('LAZY_WRITE_MAX_SECONDS', '10'))  # 未发现敏感信息时延迟写出的最长时间(秒)，0为不限制
+    KEYFRAME_SEEK_THRESHOLD = float(os.getenv('KEYFRAME_SEEK_THRESHOLD', '10'))  # 采样间隔达到该值(秒)时改用跳转取帧
     OCR_CONFIDENCE_THRESHOLD = float(os.getenv('OCR_CONFIDENCE_THRESHOLD', '0.6'))  # OCR置信度阈值
     BLUR_INTENSITY = int(os.getenv('BLUR_INTENSITY', '51'))  # 高斯模糊强度
 
+    # 帧变化检测配置（画面未变化时复用上一帧OCR结果）
+    OCR_SKIP_UNCHANGED = os.getenv('OCR_SKIP_UNCHANGED', 'true').lower() == 'true'
+    FRAME_DIFF_PIXEL_THRESHOLD = int(os.getenv('FRAME_DIFF_PIXEL_THRESHOLD', '16'))  # 像素灰度差阈值
+    FRAME_DIFF_MAX_CHANGED_RATIO = float(os.getenv('FRAME_DIFF_MAX_CHANGED_RATIO', '0'))  # 允许的变化像素占比
+    FRAME_DIFF_WIDTH = int(os.getenv('FRAME_DIFF_WIDTH', '480'))  # 差分比较时的缩放宽度
+    FRAME_DIFF_ROW_GAP = int(os.getenv('FRAME_DIFF_ROW_GAP', '2'))  # 变化行合并为同一条带的最大间隔(缩放后行数)
+
+    # 区域增量OCR配置（只识别变化区域，其余区域沿用上一次结果）
+    OCR_INCREMENTAL = os.getenv('OCR_INCREMENTAL', 'true').lower() == 'true'
+    OCR_REGION_MAX_RATIO = float(os.getenv('OCR_REGION_MAX_RATIO', '0.5'))  # 变化面积超过该比例时整帧识别
+    OCR_REGION_PADDING = int(os.getenv('OCR_REGION_PADDING', '8'))  # 变化区域外扩像素
+
+    # 文字区域检测配置（OCR前定位文字，无文字的帧跳过OCR，其余只识别候选区域）
+    TEXT_DETECT_ENABLED = os.getenv('TEXT_DETECT_ENABLED', 'true').lower() == 'true'
+    TEXT_DETECT_WIDTH = int(os.getenv('TEXT_DETECT_WIDTH', '960'))  # 检测时的缩放宽度
+    TEXT_DETECT_GRADIENT_THRESHOLD = int(os.getenv('TEXT_DETECT_GRADIENT_THRESHOLD', '48'))  # 边缘梯度阈值
+    TEXT_DETECT_MIN_HEIGHT = int(os.getenv('TEXT_DETECT_MIN_HEIGHT', '4'))  # 文字块最小高度(缩放后像素)
+
+    # OCR结果缓存配置（按图像内容哈希缓存）
+    OCR_CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+    OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', '2048'))  # 内存LRU条目数
+    OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', '')  # 磁盘缓存目录，为空时不启用
+    OCR_CACHE_OBS_PREFIX = os.getenv('OCR_CACHE_OBS_PREFIX', '')  # OBS缓存前缀，为空时不启用
+
+    # OCR图像预处理配置（送入OCR前灰度化、按文字高度缩小，边界框换算回原图坐标）
+    OCR_GRAYSCALE = os.getenv('OCR_GRAYSCALE', 'true').lower() == 'true'
+    OCR_TARGET_TEXT_HEIGHT = int(os.getenv('OCR_TARGET_TEXT_HEIGHT', '0'))  # 缩放后的目标文字高度(像素)，0为不缩放(默认)
+    OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', '0'))  # 送入OCR的图像长边上限(像素)，0为不限制
+    OCR_BINARIZE = os.getenv('OCR_BINARIZE', 'false').lower() == 'true'  # 是否做Otsu二值化
+    OCR_IMAGE_FORMAT = os.getenv('OCR_IMAGE_FORMAT', 'jpg')  # 云端上传编码格式: jpg / webp
+    OCR_IMAGE_QUALITY = int(os.getenv('OCR_IMAGE_QUALITY', '90'))  # 云端上传编码质量(1-100)
+
+    # 本地Tesseract配置
+    TESSERACT_CMD = os.getenv('TESSERACT_CMD', '')  # 可执行文件路径，为空时自动查找
+    TESSERACT_WORKERS = int(os.getenv('TESSERACT_WORKERS', '0'))  # 并发识别数(超出的识别排队等待)，0时按CPU核数/流水线进程数
+
+    # 本地流水线配置
+    PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '1'))  # 并行处理切片的进程数，1为顺序处理
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # 后端后台任务队列的工作线程数
+
+    # 切片完成跟踪（决定何时触发合并）: auto / db / obs / local
+    COMPLETION_TRACKER = os.getenv('COMPLETION_TRACKER', 'auto')
+
     # Serverless函数URN配置（用于函数间调用）
     DLP_SCANNER_FUNCTION_URN = os.getenv('DLP_SCANNER_FUNCTION_URN', '')
     VIDEO_MERGER_FUNCTION_URN = os.getenv('VIDEO_MERGER_FUNCTION_URN', '')
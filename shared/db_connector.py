@@ -2,11 +2,165 @@
 数据库连接模块
 提供数据库连接和常用操作
 """
+import time
+import queue
+import threading
 import pymysql
 from contextlib import contextmanager
 from shared.config import Config
 
 
+class ConnectionPool:
+    """
+    线程安全的数据库连接池
+    连接在进程内复用(FunctionGraph实例复用时跨调用保持)，取出时做健康检查，超过最大存活时间的连接会被替换
+    """
+
+    def __init__(self, config, size=None, max_lifetime=None, timeout=None, ping_interval=None):
+        """
+        初始化
+        :param config: pymysql.connect参数
+        :param size: 最大连接数
+        :param max_lifetime: 连接最大存活时间(秒)，超过后关闭重建
+        :param timeout: 连接耗尽时等待空闲连接的最长时间(秒)
+        :param ping_interval: 连接空闲超过该时间(秒)后，取出时先ping检查
+        """
+        self.config = config
+        self.size = size or Config.DB_POOL_SIZE
+        self.max_lifetime = max_lifetime if max_lifetime is not None else Config.DB_POOL_MAX_LIFETIME
+        self.timeout = timeout if timeout is not None else Config.DB_POOL_TIMEOUT
+        self.ping_interval = ping_interval if ping_interval is not None else Config.DB_POOL_PING_INTERVAL
+
+        # 空闲连接 (conn, created_at, last_used)，后进先出使常用连接保持活跃
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.stats = {
+            'acquired': 0,
+            'created': 0,
+            'pings': 0,
+            'expired': 0,
+            'discarded': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0
+        }
+
+    def acquire(self):
+        """
+        取出一个可用连接
+        :return: (conn, created_at)
+        """
+        start = time.time()
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise TimeoutError(f"等待数据库连接超时({self.timeout}秒)，连接池大小: {self.size}")
+            waited = time.time() - start
+            with self._lock:
+                self.stats['wait_time_total'] += waited
+                self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+
+        try:
+            conn, created_at = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        self._count('acquired')
+        return conn, created_at
+
+    def release(self, conn, created_at, broken=False):
+        """
+        归还连接
+        :param conn: 连接
+        :param created_at: 连接创建时间
+        :param broken: 连接已不可用时直接关闭
+        """
+        try:
+            if broken or time.time() - created_at > self.max_lifetime:
+                self._count('discarded' if broken else 'expired')
+                _close_quietly(conn)
+            else:
+                self._idle.put((conn, created_at, time.time()))
+        finally:
+            self._slots.release()
+
+    def get_stats(self):
+        """获取连接池统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
+
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(conn)
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, created_at, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            now = time.time()
+            if now - created_at > self.max_lifetime:
+                self._count('expired')
+                _close_quietly(conn)
+                continue
+
+            if now - last_used > self.ping_interval:
+                try:
+                    conn.ping(reconnect=True)
+                    self._count('pings')
+                except Exception:
+                    self._count('discarded')
+                    _close_quietly(conn)
+                    continue
+            return conn, created_at
+
+        conn = pymysql.connect(**self.config)
+        self._count('created')
+        return conn, time.time()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config):
+    """
+    获取进程级连接池，相同连接参数共享同一个池
+    :param config: pymysql.connect参数
+    :return: ConnectionPool
+    """
+    key = tuple(sorted((k, str(v)) for k, v in config.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(config)
+        return _pools[key]
+
+
 class DatabaseConnector:
     """数据库连接器"""
 
@@ -20,22 +174,31 @@ class DatabaseConnector:
             'charset': 'utf8mb4',
             'cursorclass': pymysql.cursors.DictCursor
         }
+        self.pool = get_pool(self.config)
 
     @contextmanager
     def get_connection(self):
-        """获取数据库连接(上下文管理器)"""
-        conn = None
+        """从连接池获取数据库连接(上下文管理器)，退出时提交并归还"""
+        conn, created_at = self.pool.acquire()
+        broken = False
         try:
-            conn = pymysql.connect(**self.config)
             yield conn
             conn.commit()
         except Exception as e:
-            if conn:
+            try:
                 conn.rollback()
+            except Exception:
+                broken = True
+            if isinstance(e, pymysql.err.OperationalError):
+                broken = True
             raise e
         finally:
-            if conn:
-                conn.close()
+            self.pool.release(conn, created_at, broken=broken)
+
+    def ping(self):
+        """检查数据库是否可用，不可用时抛出异常"""
+        with self.get_connection() as conn:
+            conn.ping(reconnect=True)
 
     def execute_query(self, sql, params=None):
         """执行查询并返回结果"""
@@ -57,6 +220,19 @@ class DatabaseConnector:
             with conn.cursor() as cursor:
                 return cursor.execute(sql, params or ())
 
+    def execute_many(self, sql, params_list, batch_size=500):
+        """
+        分批执行批量插入/更新，所有批次在同一个事务中提交
+        pymysql会把 INSERT ... VALUES 的executemany改写为多行插入，每批只需一次往返
+        :return: 影响的总行数
+        """
+        total = 0
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                for start in range(0, len(params_list), batch_size):
+                    total += cursor.executemany(sql, params_list[start:start + batch_size]) or 0
+        return total
+
 
 # 视频相关数据库操作
 class VideoDAO:
@@ -125,6 +301,29 @@ class AuditLogDAO:
             detected_text, confidence, bbox_x, bbox_y, bbox_width, bbox_height
         ))
 
+    def create_audit_logs_bulk(self, audit_logs, batch_size=500):
+        """
+        批量创建审计日志(分批多行插入，单个事务)
+        :param audit_logs: 审计日志列表，每项的键与create_audit_log的参数相同
+        :param batch_size: 每批插入的行数
+        :return: 插入的行数
+        """
+        if not audit_logs:
+            return 0
+
+        sql = """
+        INSERT INTO audit_logs
+        (video_id, slice_index, frame_id, timestamp_in_video, sensitive_type,
+         detected_text, confidence, bbox_x, bbox_y, bbox_width, bbox_height)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        params_list = [(
+            log['video_id'], log.get('slice_index'), log.get('frame_id'), log.get('timestamp_in_video'),
+            log['sensitive_type'], log.get('detected_text'), log.get('confidence'),
+            log.get('bbox_x'), log.get('bbox_y'), log.get('bbox_width'), log.get('bbox_height')
+        ) for log in audit_logs]
+        return self.db.execute_many(sql, params_list, batch_size=batch_size)
+
     def get_audit_logs_by_video(self, video_id):
         """获取视频的所有审计日志"""
         sql = """
@@ -157,6 +356,48 @@ class AuditLogDAO:
         return self.db.execute_query(sql, (days, limit))
 
 
+# 视频内容去重索引
+class ContentIndexDAO:
+    """视频内容去重索引数据访问对象"""
+
+    def __init__(self):
+        self.db = DatabaseConnector()
+
+    def find_completed(self, content_hash, config_fingerprint):
+        """查找相同内容、相同DLP配置下已处理完成的记录"""
+        sql = """
+        SELECT * FROM video_content_index
+        WHERE content_hash = %s AND config_fingerprint = %s AND status = 'completed'
+        """
+        results = self.db.execute_query(sql, (content_hash, config_fingerprint))
+        return results[0] if results else None
+
+    def register(self, content_hash, config_fingerprint, video_id):
+        """登记开始处理的视频(已完成的记录不会被覆盖)"""
+        sql = """
+        INSERT INTO video_content_index (content_hash, config_fingerprint, video_id, status)
+        VALUES (%s, %s, %s, 'processing')
+        ON DUPLICATE KEY UPDATE
+            video_id = IF(status = 'completed', video_id, VALUES(video_id)),
+            status = IF(status = 'completed', status, 'processing')
+        """
+        return self.db.execute_update(sql, (content_hash, config_fingerprint, video_id))
+
+    def mark_completed(self, video_id, obs_output_path, audit_log_path):
+        """视频处理完成后更新索引"""
+        sql = """
+        UPDATE video_content_index
+        SET status = 'completed', obs_output_path = %s, audit_log_path = %s
+        WHERE video_id = %s AND status = 'processing'
+        """
+        return self.db.execute_update(sql, (obs_output_path, audit_log_path, video_id))
+
+    def mark_failed(self, video_id):
+        """视频处理失败后更新索引"""
+        sql = "UPDATE video_content_index SET status = 'failed' WHERE video_id = %s AND status = 'processing'"
+        return self.db.execute_update(sql, (video_id,))
+
+
 # 水印溯源相关操作 (预留)
 class WatermarkDAO:
     """水印数据访问对象"""
@@ -0,0 +1,127 @@
+"""
+视频内容去重模块
+以视频内容SHA-256和DLP配置指纹为键，查找已经处理过的相同视频，直接复用脱敏结果和审计日志
+"""
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from shared.config import Config, SENSITIVE_PATTERNS
+
+# 处理流程本身发生会改变输出的变更时递增，使旧的索引记录失效
+# 2: 跨识别调用按位置拼行、OCR预处理、文字区域检测
+# 3: 文字区域检测合并同一行上相邻的区域
+PIPELINE_VERSION = 3
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    按块计算文件的SHA-256
+    :param path: 文件路径
+    :return: 十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dlp_config_fingerprint():
+    """
+    计算影响脱敏结果的配置指纹
+    包含所有会改变检测结果或输出视频的配置(敏感信息规则、采样、OCR引擎与阈值、帧变化检测与增量OCR、
+    OCR预处理、文字区域检测、模糊强度、切片方式)，任一变化时指纹不同，旧结果不会被复用。
+    新增影响输出的配置时需要加入这里
+    :return: 十六进制哈希字符串
+    """
+    config = {
+        'version': PIPELINE_VERSION,
+        'patterns': SENSITIVE_PATTERNS,
+        'sample_interval': Config.SAMPLE_INTERVAL,
+        'ocr_engine': 'tesseract' if Config.LOCAL_MODE else 'huawei',
+        'ocr_confidence_threshold': Config.OCR_CONFIDENCE_THRESHOLD,
+        'ocr_skip_unchanged': Config.OCR_SKIP_UNCHANGED,
+        'frame_diff': [Config.FRAME_DIFF_PIXEL_THRESHOLD, Config.FRAME_DIFF_MAX_CHANGED_RATIO,
+                       Config.FRAME_DIFF_WIDTH, Config.FRAME_DIFF_ROW_GAP],
+        'ocr_incremental': Config.OCR_INCREMENTAL,
+        'ocr_region': [Config.OCR_REGION_MAX_RATIO, Config.OCR_REGION_PADDING],
+        'ocr_preprocess': [Config.OCR_GRAYSCALE, Config.OCR_TARGET_TEXT_HEIGHT, Config.OCR_MAX_SIDE,
+                           Config.OCR_BINARIZE, Config.OCR_IMAGE_FORMAT, Config.OCR_IMAGE_QUALITY],
+        'text_detect': [Config.TEXT_DETECT_ENABLED, Config.TEXT_DETECT_WIDTH,
+                        Config.TEXT_DETECT_GRADIENT_THRESHOLD, Config.TEXT_DETECT_MIN_HEIGHT],
+        'blur_intensity': Config.BLUR_INTENSITY,
+        'slice_duration': Config.SLICE_DURATION,
+        'slice_mode': Config.SLICE_MODE
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class LocalDedupIndex:
+    """基于本地JSON文件的去重索引"""
+
+    def __init__(self, index_path):
+        """
+        :param index_path: 索引文件路径
+        """
+        self.index_path = index_path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(content_hash, config_fingerprint):
+        return f"{content_hash}|{config_fingerprint}"
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取去重索引失败: {e}")
+            return {}
+
+    def _save(self, index):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def lookup(self, content_hash, config_fingerprint):
+        """
+        查找已处理的相同视频
+        :param content_hash: 视频内容SHA-256
+        :param config_fingerprint: DLP配置指纹
+        :return: 索引记录 {'video_id', 'output_path', 'audit_log_path', 'sensitive_count', ...}；
+                 未找到或输出文件已被删除时返回None
+        """
+        with self._lock:
+            entry = self._load().get(self._key(content_hash, config_fingerprint))
+        if not entry or not os.path.exists(entry.get('output_path', '')):
+            return None
+        return entry
+
+    def record(self, content_hash, config_fingerprint, video_id, output_path, audit_log_path=None,
+               sensitive_count=0):
+        """
+        记录处理完成的视频
+        :param content_hash: 视频内容SHA-256
+        :param config_fingerprint: DLP配置指纹
+        :param video_id: 视频ID
+        :param output_path: 脱敏后的视频路径
+        :param audit_log_path: 审计日志路径
+        :param sensitive_count: 敏感信息数量
+        """
+        with self._lock:
+            index = self._load()
+            index[self._key(content_hash, config_fingerprint)] = {
+                'content_hash': content_hash,
+                'config_fingerprint': config_fingerprint,
+                'video_id': video_id,
+                'output_path': output_path,
+                'audit_log_path': audit_log_path,
+                'sensitive_count': sensitive_count,
+                'created_at': datetime.now().isoformat()
+            }
+            self._save(index)
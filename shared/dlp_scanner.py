@@ -4,9 +4,61 @@ DLP扫描模块
 """
 import re
 import cv2
+from collections import deque
 import numpy as np
 from shared.config import SENSITIVE_PATTERNS, Config
 from shared.ocr_service import OCRService
+from shared.ocr_dispatcher import OCRDispatcher, get_shared_rate_limiter
+from shared.frame_diff import FrameChangeDetector, bbox_to_rect, rects_intersect, union_rect, merge_rects
+from shared.text_lines import group_ocr_lines, words_in_span, union_bbox
+from shared.text_detect import TextRegionDetector
+
+
+class _PendingOCR:
+    """一个采样帧的OCR结果：沿用的旧结果 + 在途的OCR请求"""
+
+    def __init__(self, kept=None, futures=()):
+        """
+        :param kept: 直接沿用的OCR结果列表
+        :param futures: 在途OCR请求的Future列表
+        """
+        self.kept = kept or []
+        self.futures = list(futures)
+        self._results = None
+
+    def done(self):
+        """在途请求是否都已完成"""
+        return self._results is not None or all(future.done() for future in self.futures)
+
+    def result(self):
+        """等待在途请求完成，返回合并后的OCR结果列表"""
+        if self._results is None:
+            results = list(self.kept)
+            for future in self.futures:
+                results.extend(future.result())
+            self._results = results
+        return self._results
+
+
+class _PendingScan:
+    """已提交、尚未取回的单帧扫描"""
+
+    def __init__(self, scanner, pending_ocr, ocr_mode):
+        self._scanner = scanner
+        self._ocr = pending_ocr
+        self._ocr_mode = ocr_mode
+        self._result = None
+
+    def done(self):
+        """OCR是否已完成(取结果不会阻塞)"""
+        return self._result is not None or self._ocr.done()
+
+    def result(self):
+        """等待OCR完成并返回检测结果字典(同scan_frame)"""
+        if self._result is None:
+            self._result = self._scanner._detect(self._ocr.result())
+            self._result['ocr_mode'] = self._ocr_mode
+        return self._result
 
 
 class DLPScanner:
@@ -19,8 +71,62 @@ class DLPScanner:
         """
         self.confidence_threshold = confidence_threshold or Config.OCR_CONFIDENCE_THRESHOLD
         self.patterns = SENSITIVE_PATTERNS
+        self._compile_patterns()
         self.ocr_service = OCRService()  # 使用OCR服务抽象层
 
+        # 云端OCR并发提交并限速；本地Tesseract按工作池大小并发
+        use_cloud = self.ocr_service.use_cloud
+        self.dispatcher = OCRDispatcher(
+            self.ocr_service,
+            concurrency=Config.OCR_CONCURRENCY if use_cloud else self.ocr_service.tesseract.size,
+            rate_limiter=get_shared_rate_limiter() if use_cloud else None
+        )
+
+        # 画面未变化时复用上一次OCR结果；开启增量OCR时只识别变化区域
+        self.incremental = Config.OCR_INCREMENTAL
+        use_detector = Config.OCR_SKIP_UNCHANGED or self.incremental
+        self.change_detector = FrameChangeDetector() if use_detector else None
+        # 需要重新识别的帧先定位文字区域，无文字时跳过OCR
+        self.text_detector = TextRegionDetector() if Config.TEXT_DETECT_ENABLED else None
+        self._last_ocr = None
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats():
+        """初始化扫描统计"""
+        return {
+            'frames_scanned': 0,  # 扫描的采样帧数
+            'ocr_calls': 0,  # 整帧OCR次数
+            'ocr_skipped': 0,  # 画面未变化、完全复用结果的帧数
+            'ocr_partial': 0,  # 只识别变化区域的帧数
+            'ocr_no_text': 0,  # 未检测到文字、跳过OCR的帧数
+            'ocr_text_roi': 0,  # 只识别文字候选区域的帧数
+            'region_ocr_calls': 0  # 区域OCR调用次数
+        }
+
+    def get_stats(self):
+        """
+        获取本轮扫描统计
+        :return: {'frames_scanned', 'ocr_calls', 'ocr_skipped', 'ocr_partial', 'ocr_no_text', 'ocr_text_roi',
+                  'region_ocr_calls', 'skip_ratio', 'ocr_cache', 'ocr_latency', 'ocr_dispatch'}
+        """
+        stats = dict(self.stats)
+        frames = stats['frames_scanned']
+        stats['skip_ratio'] = stats['ocr_skipped'] / frames if frames else 0.0
+        stats['ocr_cache'] = self.ocr_service.get_cache_stats()
+        stats['ocr_latency'] = self.ocr_service.get_latency_stats()
+        stats['ocr_dispatch'] = self.dispatcher.get_stats()
+        return stats
+
+    def reset_stats(self):
+        """重置扫描统计和参考帧（开始处理新视频时调用）"""
+        self.stats = self._new_stats()
+        self.ocr_service.latency.reset()
+        self.ocr_service.preprocessor.reset()
+        self._last_ocr = None
+        if self.change_detector:
+            self.change_detector.reset()
+
     def ocr_extract_text(self, image):
         """
         使用OCR提取图像中的文字
@@ -33,6 +139,120 @@ class DLPScanner:
         # 已经过滤过置信度，直接返回
         return results
 
+    @property
+    def max_in_flight(self):
+        """同时在途的OCR请求上限，流水线扫描时据此限制未取回的帧数"""
+        return self.dispatcher.concurrency
+
+    def _submit_ocr(self, frame):
+        """
+        带变化检测的OCR：与上一次OCR的帧相比没有可见变化时，直接复用其文字和边界框；
+        开启增量OCR时只识别变化区域，未变化区域的结果沿用上一次。
+        OCR请求经调度器提交，整帧识别不等待此前的请求；区域识别需要上一帧的文字框来扩展区域，会等待上一帧完成
+        :param frame: OpenCV图像
+        :return: (识别方式, _PendingOCR)，识别方式为 'full' / 'text_roi' / 'no_text' / 'partial' / 'reused'
+        """
+        self.stats['frames_scanned'] += 1
+
+        if not self.change_detector or self._last_ocr is None:
+            return self._ocr_full_frame(frame)
+
+        if not self.incremental:
+            if self.change_detector.is_changed(frame):
+                return self._ocr_full_frame(frame)
+            self.stats['ocr_skipped'] += 1
+            return 'reused', self._last_ocr
+
+        regions = self.change_detector.dirty_regions(frame)
+        if regions is None:
+            return self._ocr_full_frame(frame)
+
+        if not regions:
+            self.stats['ocr_skipped'] += 1
+            return 'reused', self._last_ocr
+
+        # 扩展变化区域，使其完整覆盖与之相交的旧文字，避免文字被裁断
+        last_results = self._last_ocr.result()
+        regions = self._expand_regions(regions, last_results)
+
+        frame_area = frame.shape[0] * frame.shape[1]
+        dirty_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if dirty_area > frame_area * Config.OCR_REGION_MAX_RATIO:
+            return self._ocr_full_frame(frame)
+
+        kept = [
+            item for item in last_results
+            if not any(rects_intersect(bbox_to_rect(item['bbox']), region) for region in regions)
+        ]
+        futures = []
+        for x1, y1, x2, y2 in regions:
+            # 变化区域内已没有文字时不再识别，区域内的旧文字随之移除
+            if self.text_detector and not self.text_detector.detect(frame[y1:y2, x1:x2], frame.shape[0]):
+                continue
+            futures.append(self.dispatcher.submit(frame[y1:y2, x1:x2], offset=(x1, y1)))
+            self.stats['region_ocr_calls'] += 1
+
+        self.stats['ocr_partial'] += 1
+        self.change_detector.update(frame, regions)
+        self._last_ocr = _PendingOCR(kept, futures)
+        return 'partial', self._last_ocr
+
+    def _ocr_full_frame(self, frame):
+        """
+        提交整帧OCR并更新参考帧
+        开启文字区域检测时先定位文字：没有候选区域的帧不调用OCR，候选区域面积不大时只识别候选区域，
+        候选区域以外视为无文字
+        :return: (识别方式, _PendingOCR)
+        """
+        mode = 'full'
+        futures = []
+        regions = self.text_detector.detect(frame) if self.text_detector else None
+
+        if regions is not None and not regions:
+            mode = 'no_text'
+            self.stats['ocr_no_text'] += 1
+        elif regions:
+            frame_area = frame.shape[0] * frame.shape[1]
+            text_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+            if text_area <= frame_area * Config.OCR_REGION_MAX_RATIO:
+                mode = 'text_roi'
+                for x1, y1, x2, y2 in regions:
+                    futures.append(self.dispatcher.submit(frame[y1:y2, x1:x2], offset=(x1, y1)))
+                    self.stats['region_ocr_calls'] += 1
+                self.stats['ocr_text_roi'] += 1
+
+        if mode == 'full':
+            futures.append(self.dispatcher.submit(frame))
+            self.stats['ocr_calls'] += 1
+
+        if self.change_detector:
+            self.change_detector.update(frame)
+        self._last_ocr = _PendingOCR(futures=futures)
+        return mode, self._last_ocr
+
+    def _expand_regions(self, regions, ocr_results):
+        """
+        将变化区域扩展到完整包含与其相交的已有文字边界框
+        :param regions: 变化区域 [(x1, y1, x2, y2), ...]
+        :param ocr_results: 上一次的OCR结果
+        :return: 扩展并合并后的区域
+        """
+        word_rects = [bbox_to_rect(item['bbox']) for item in ocr_results]
+        changed = True
+        while changed:
+            changed = False
+            expanded = []
+            for region in regions:
+                for rect in word_rects:
+                    if rects_intersect(region, rect):
+                        merged = union_rect(region, rect)
+                        if merged != region:
+                            region = merged
+                            changed = True
+                expanded.append(region)
+            regions = merge_rects(expanded)
+        return regions
+
     def _legacy_ocr_extract_text(self, image):
         """
         【已废弃】原本地Tesseract实现
@@ -75,6 +295,22 @@ class DLPScanner:
 
         return results
 
+    def _compile_patterns(self):
+        """
+        预编译敏感信息规则
+        除逐条编译外，再把所有规则合并成一个带命名分组的交替表达式作为预筛：
+        绝大多数OCR文本不含敏感信息，一次匹配即可排除；命中时再逐条匹配，
+        保证不同类型之间相互重叠的结果(如aws_key同时满足huawei_ak)与原来一致
+        """
+        self._compiled_patterns = [
+            (sensitive_type, re.compile(pattern, re.IGNORECASE))
+            for sensitive_type, pattern in self.patterns.items()
+        ]
+        self._combined_pattern = re.compile(
+            '|'.join(f"(?P<{sensitive_type}>{pattern})" for sensitive_type, pattern in self.patterns.items()),
+            re.IGNORECASE
+        )
+
     def detect_sensitive_info(self, text):
         """
         检测文本中的敏感信息
@@ -83,8 +319,11 @@ class DLPScanner:
         """
         detections = []
 
-        for sensitive_type, pattern in self.patterns.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
+        if not self._combined_pattern.search(text):
+            return detections
+
+        for sensitive_type, pattern in self._compiled_patterns:
+            matches = pattern.finditer(text)
             for match in matches:
                 detections.append({
                     'type': sensitive_type,
@@ -99,55 +338,86 @@ class DLPScanner:
         """
         扫描单个视频帧
         :param frame: OpenCV图像
-        :return: 检测结果字典
+        :return: 检测结果字典 {'ocr_count', 'line_count', 'sensitive_count', 'detections', 'ocr_mode'}，
+                 ocr_mode为本帧的识别方式(full/text_roi/no_text/partial/reused)
+        """
+        return self.submit_frame(frame).result()
+
+    def submit_frame(self, frame):
+        """
+        提交单个视频帧的扫描，不等待OCR完成
+        帧必须按顺序提交(变化检测以上一次提交的帧为参考)，结果可稍后按顺序取回
+        :param frame: OpenCV图像，取回结果前不能被修改
+        :return: 待取回的扫描，result()返回与scan_frame相同的检测结果字典，done()表示是否已可无阻塞取回
         """
-        # Step 1: OCR提取文字
-        ocr_results = self.ocr_extract_text(frame)
+        # OCR提取文字（画面未变化时复用上一次结果，无文字时跳过）
+        ocr_mode, pending_ocr = self._submit_ocr(frame)
+        return _PendingScan(self, pending_ocr, ocr_mode)
 
-        # Step 2: 检测敏感信息
+    def _detect(self, ocr_results):
+        """把OCR单词组合成文本行，逐行检测敏感信息"""
+        lines = group_ocr_lines(ocr_results)
         sensitive_detections = []
 
-        for ocr_item in ocr_results:
-            text = ocr_item['text']
+        for line in lines:
+            text = line['text']
             detections = self.detect_sensitive_info(text)
 
             for detection in detections:
+                # 匹配区间映射回覆盖它的单词，边界框取这些单词的外接框
+                words = words_in_span(line, detection['start'], detection['end'])
                 sensitive_detections.append({
                     'ocr_text': text,
-                    'ocr_confidence': ocr_item['confidence'],
-                    'bbox': ocr_item['bbox'],
+                    'ocr_confidence': min(word['confidence'] for word in words),
+                    'bbox': union_bbox(words),
                     'sensitive_type': detection['type'],
                     'matched_text': detection['matched_text']
                 })
 
         return {
             'ocr_count': len(ocr_results),
+            'line_count': len(lines),
             'sensitive_count': len(sensitive_detections),
             'detections': sensitive_detections
         }
 
     def scan_video_frames(self, frames):
         """
-        扫描多个视频帧
-        :param frames: 帧列表 [(frame_id, timestamp, frame_image), ...]
-        :return: 扫描结果列表
+        流式扫描多个视频帧
+        结果只保留帧元数据和检测结果，不持有帧图像；需要脱敏时由
+        SensitiveInfoMasker.mask_video按需重新解码。
+        最多max_in_flight帧同时在途，结果按帧顺序取回
+        :param frames: 帧的可迭代对象 [(frame_id, timestamp, frame_image), ...]，
+                       推荐传入VideoSlicer.iter_keyframes生成器
+        :return: 扫描结果列表 [{'frame_id', 'timestamp', 'scan_result'}, ...]
         """
         results = []
+        pending = deque()
+        frame_count = 0
 
-        for frame_id, timestamp, frame in frames:
-            print(f"扫描帧 {frame_id} (时间={timestamp:.2f}s)...")
-            scan_result = self.scan_frame(frame)
-
+        def collect():
+            frame_id, timestamp, scan = pending.popleft()
+            scan_result = scan.result()
             if scan_result['sensitive_count'] > 0:
                 results.append({
                     'frame_id': frame_id,
                     'timestamp': timestamp,
-                    'frame': frame,
                     'scan_result': scan_result
                 })
-                print(f"  ⚠️  发现 {scan_result['sensitive_count']} 个敏感信息!")
+                print(f"  ⚠️  帧 {frame_id} 发现 {scan_result['sensitive_count']} 个敏感信息!")
+
+        for frame_id, timestamp, frame in frames:
+            print(f"扫描帧 {frame_id} (时间={timestamp:.2f}s)...")
+            pending.append((frame_id, timestamp, self.submit_frame(frame)))
+            frame_count += 1
 
-        print(f"扫描完成: {len(frames)} 帧，发现 {len(results)} 帧包含敏感信息")
+            while len(pending) > self.max_in_flight or (pending and pending[0][2].done()):
+                collect()
+
+        while pending:
+            collect()
+
+        print(f"扫描完成: {frame_count} 帧，发现 {len(results)} 帧包含敏感信息")
         return results
 
 
@@ -240,3 +510,42 @@ class SensitiveInfoMasker:
                 result = self.apply_mosaic(result, bbox)
 
         return result
+
+    def mask_video(self, input_path, output_path, scan_results, interval=1.0, method='blur'):
+        """
+        根据扫描结果重新解码视频并对敏感帧脱敏
+        每个关键帧的检测结果作用于其所在的整个采样区间
+        :param input_path: 输入视频路径
+        :param output_path: 输出视频路径
+        :param scan_results: scan_video_frames返回的扫描结果列表
+        :param interval: 扫描时使用的采样间隔(秒)
+        :param method: 脱敏方法 'blur' 或 'mosaic'
+        """
+        sensitive_frames = {result['frame_id']: result for result in scan_results}
+
+        cap = cv2.VideoCapture(input_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+        frame_id = 0
+        interval_frames = max(1, int(fps * interval))
+
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            keyframe_id = frame_id // interval_frames
+            if keyframe_id in sensitive_frames:
+                detections = sensitive_frames[keyframe_id]['scan_result']['detections']
+                frame = self.mask_frame(frame, detections, method=method)
+
+            out.write(frame)
+            frame_id += 1
+
+        cap.release()
+        out.release()
@@ -0,0 +1,172 @@
+"""
+帧变化检测模块
+通过缩小后的灰度图差分判断相邻采样帧是否发生可见变化，并定位变化区域
+"""
+import cv2
+import numpy as np
+from shared.config import Config
+
+
+class FrameChangeDetector:
+    """帧变化检测器 - 与上一次OCR的参考帧比较"""
+
+    def __init__(self, pixel_threshold=None, max_changed_ratio=None, width=None):
+        """
+        初始化
+        :param pixel_threshold: 单个像素灰度差超过该值视为变化
+        :param max_changed_ratio: 变化像素占比不超过该值时视为未变化(0表示任一像素变化即视为变化)
+        :param width: 比较前将帧等比缩小到的宽度(像素)
+        """
+        self.pixel_threshold = pixel_threshold if pixel_threshold is not None else Config.FRAME_DIFF_PIXEL_THRESHOLD
+        self.max_changed_ratio = max_changed_ratio if max_changed_ratio is not None else Config.FRAME_DIFF_MAX_CHANGED_RATIO
+        self.width = width or Config.FRAME_DIFF_WIDTH
+        self.reference = None
+        self.reference_shape = None
+
+    def _signature(self, frame):
+        """
+        计算帧签名：缩小后的灰度图
+        缩小使用INTER_AREA取均值，可以平滑编码噪声，又能保留文字笔画级别的变化
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape[:2]
+        if width > self.width:
+            new_height = max(1, int(height * self.width / width))
+            gray = cv2.resize(gray, (self.width, new_height), interpolation=cv2.INTER_AREA)
+        return gray.astype(np.int16)
+
+    def diff_mask(self, frame):
+        """
+        计算当前帧与参考帧的变化掩码
+        :param frame: OpenCV图像
+        :return: 签名分辨率下的布尔掩码；没有参考帧或尺寸不同时返回None
+        """
+        if self.reference is None or frame.shape[:2] != self.reference_shape:
+            return None
+
+        signature = self._signature(frame)
+        return np.abs(signature - self.reference) > self.pixel_threshold
+
+    def is_changed(self, frame):
+        """
+        判断当前帧相对参考帧是否发生变化
+        :param frame: OpenCV图像
+        :return: 是否变化
+        """
+        mask = self.diff_mask(frame)
+        if mask is None:
+            return True
+        return mask.mean() > self.max_changed_ratio
+
+    def dirty_regions(self, frame, padding=None, row_gap=None):
+        """
+        定位当前帧相对参考帧的变化区域
+        按行将变化像素聚合成水平条带，每个条带取变化列的范围，
+        例如终端滚动一行时只返回该行所在的一条矩形
+        :param frame: OpenCV图像
+        :param padding: 矩形向外扩展的像素数(原图坐标)
+        :param row_gap: 签名分辨率下间隔不超过该行数的变化行合并为同一条带
+        :return: 原图坐标的矩形列表 [(x1, y1, x2, y2), ...]，未变化时为空列表；没有参考帧时返回None
+        """
+        mask = self.diff_mask(frame)
+        if mask is None:
+            return None
+
+        padding = Config.OCR_REGION_PADDING if padding is None else padding
+        row_gap = Config.FRAME_DIFF_ROW_GAP if row_gap is None else row_gap
+
+        height, width = frame.shape[:2]
+        scale_y = height / mask.shape[0]
+        scale_x = width / mask.shape[1]
+
+        if mask.mean() <= self.max_changed_ratio:
+            return []
+
+        changed_rows = np.flatnonzero(mask.any(axis=1))
+        if len(changed_rows) == 0:
+            return []
+
+        # 按行聚合成条带
+        bands = []
+        band_start = band_end = changed_rows[0]
+        for row in changed_rows[1:]:
+            if row - band_end > row_gap + 1:
+                bands.append((band_start, band_end))
+                band_start = row
+            band_end = row
+        bands.append((band_start, band_end))
+
+        regions = []
+        for row_start, row_end in bands:
+            cols = np.flatnonzero(mask[row_start:row_end + 1].any(axis=0))
+            x1 = max(0, int(cols[0] * scale_x) - padding)
+            y1 = max(0, int(row_start * scale_y) - padding)
+            x2 = min(width, int((cols[-1] + 1) * scale_x) + padding)
+            y2 = min(height, int((row_end + 1) * scale_y) + padding)
+            regions.append((x1, y1, x2, y2))
+
+        return merge_rects(regions)
+
+    def update(self, frame, regions=None):
+        """
+        将当前帧设为新的参考帧
+        :param frame: OpenCV图像
+        :param regions: 只更新这些原图坐标矩形内的参考，其余区域保持上次OCR时的状态
+        """
+        if regions is None or self.reference is None or frame.shape[:2] != self.reference_shape:
+            self.reference = self._signature(frame)
+            self.reference_shape = frame.shape[:2]
+            return
+
+        signature = self._signature(frame)
+        height, width = frame.shape[:2]
+        scale_y = signature.shape[0] / height
+        scale_x = signature.shape[1] / width
+        for x1, y1, x2, y2 in regions:
+            sy1, sy2 = int(y1 * scale_y), int(np.ceil(y2 * scale_y))
+            sx1, sx2 = int(x1 * scale_x), int(np.ceil(x2 * scale_x))
+            self.reference[sy1:sy2, sx1:sx2] = signature[sy1:sy2, sx1:sx2]
+
+    def reset(self):
+        """清除参考帧"""
+        self.reference = None
+        self.reference_shape = None
+
+
+def bbox_to_rect(bbox):
+    """OCR边界框(x, y, w, h)转换为矩形(x1, y1, x2, y2)"""
+    x, y, w, h = bbox
+    return (x, y, x + w, y + h)
+
+
+def rects_intersect(a, b):
+    """判断两个矩形(x1, y1, x2, y2)是否相交"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def union_rect(a, b):
+    """两个矩形的外接矩形"""
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def merge_rects(rects):
+    """
+    合并相互重叠的矩形
+    :param rects: 矩形列表 [(x1, y1, x2, y2), ...]
+    :return: 互不重叠的矩形列表
+    """
+    merged = list(rects)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for rect in merged:
+            for i, other in enumerate(result):
+                if rects_intersect(rect, other):
+                    result[i] = union_rect(rect, other)
+                    changed = True
+                    break
+            else:
+                result.append(rect)
+        merged = result
+    return merged
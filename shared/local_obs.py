@@ -0,0 +1,213 @@
+"""
+本地OBS替身
+在进程内用本地目录模拟华为云ObsClient的常用接口(同名方法、同结构的响应)，
+用于本地测试OBSHelper及依赖OBS的流程，无需真实的OBS服务
+"""
+import os
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+
+
+class _Obj:
+    """简单属性容器，模拟SDK的响应/对象结构"""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class AppendObjectContent(_Obj):
+    """追加写内容(对应obs.AppendObjectContent)"""
+
+    def __init__(self, content=None, position=None, offset=None, isFile=False):
+        super().__init__(content=content, position=position, offset=offset, isFile=isFile)
+
+
+class DeleteObjectsRequest(_Obj):
+    """批量删除请求(对应obs.DeleteObjectsRequest)"""
+
+    def __init__(self, quiet=None, objects=None):
+        super().__init__(quiet=quiet, objects=objects or [])
+
+
+class Object(_Obj):
+    """待删除对象(对应obs.Object)"""
+
+    def __init__(self, key=None, versionId=None):
+        super().__init__(key=key, versionId=versionId)
+
+
+def _ok(body=None, status=200):
+    return _Obj(status=status, body=body, errorCode=None, errorMessage=None)
+
+
+def _error(status, code, message):
+    return _Obj(status=status, body=None, errorCode=code, errorMessage=message)
+
+
+class LocalObsClient:
+    """以本地目录模拟的ObsClient，对象键映射为 {root}/{bucket}/{key}"""
+
+    def __init__(self, root):
+        """
+        :param root: 本地存储根目录
+        """
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, bucket_name, key):
+        path = os.path.abspath(os.path.join(self.root, bucket_name, key))
+        if not path.startswith(os.path.abspath(os.path.join(self.root, bucket_name)) + os.sep):
+            raise ValueError(f"非法的对象键: {key}")
+        return path
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def putFile(self, bucketName, objectKey, file_path, **kwargs):
+        if not os.path.isfile(file_path):
+            return _error(400, 'NoSuchFile', f"文件不存在: {file_path}")
+        path = self._path(bucketName, objectKey)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(file_path, path)
+        return _ok()
+
+    def uploadFile(self, bucketName, objectKey, uploadFile, partSize=None, taskNum=1, enableCheckpoint=False,
+                   checkpointFile=None, **kwargs):
+        return self.putFile(bucketName, objectKey, uploadFile)
+
+    def putContent(self, bucketName, objectKey, content=None, **kwargs):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        self._write(self._path(bucketName, objectKey), content or b'')
+        return _ok()
+
+    def appendObject(self, bucketName, objectKey, content=None, **kwargs):
+        data = content.content
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        path = self._path(bucketName, objectKey)
+        with self._lock:
+            length = os.path.getsize(path) if os.path.exists(path) else 0
+            if (content.position or 0) != length:
+                return _error(409, 'PositionNotEqualToLength', '追加位置与对象长度不一致')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'ab') as f:
+                f.write(data)
+            return _ok(_Obj(nextPosition=length + len(data)))
+
+    def getObject(self, bucketName, objectKey, downloadPath=None, loadStreamInMemory=False, **kwargs):
+        path = self._path(bucketName, objectKey)
+        if not os.path.isfile(path):
+            return _error(404, 'NoSuchKey', f"对象不存在: {objectKey}")
+        if downloadPath:
+            os.makedirs(os.path.dirname(os.path.abspath(downloadPath)), exist_ok=True)
+            shutil.copyfile(path, downloadPath)
+            return _ok()
+        with open(path, 'rb') as f:
+            return _ok(_Obj(buffer=f.read()))
+
+    def downloadFile(self, bucketName, objectKey, downloadFile=None, partSize=None, taskNum=1,
+                     enableCheckpoint=False, checkpointFile=None, **kwargs):
+        return self.getObject(bucketName, objectKey, downloadPath=downloadFile or objectKey)
+
+    def getObjectMetadata(self, bucketName, objectKey, **kwargs):
+        path = self._path(bucketName, objectKey)
+        if not os.path.isfile(path):
+            return _error(404, 'NoSuchKey', f"对象不存在: {objectKey}")
+        return _ok(_Obj(contentLength=os.path.getsize(path)))
+
+    def listObjects(self, bucketName, prefix=None, marker=None, max_keys=None, delimiter=None, **kwargs):
+        prefix = prefix or ''
+        max_keys = max_keys or 1000
+        bucket_root = os.path.join(self.root, bucketName)
+
+        keys = []
+        for dirpath, _, filenames in os.walk(bucket_root):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                key = os.path.relpath(os.path.join(dirpath, filename), bucket_root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys.append(key)
+        keys.sort()
+
+        # 按分隔符折叠出公共前缀
+        entries = []
+        seen_prefixes = set()
+        for key in keys:
+            if delimiter:
+                rest = key[len(prefix):]
+                if delimiter in rest:
+                    common = prefix + rest.split(delimiter, 1)[0] + delimiter
+                    if common not in seen_prefixes:
+                        seen_prefixes.add(common)
+                        entries.append((common, True))
+                    continue
+            entries.append((key, False))
+
+        if marker:
+            entries = [entry for entry in entries if entry[0] > marker]
+        page = entries[:max_keys]
+        is_truncated = len(entries) > max_keys
+
+        contents = []
+        common_prefixes = []
+        for name, is_prefix in page:
+            if is_prefix:
+                common_prefixes.append(_Obj(prefix=name))
+                continue
+            path = os.path.join(bucket_root, name)
+            with open(path, 'rb') as f:
+                etag = hashlib.md5(f.read()).hexdigest()
+            contents.append(_Obj(
+                key=name,
+                size=os.path.getsize(path),
+                lastModified=datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y/%m/%d %H:%M:%S'),
+                etag=f'"{etag}"'
+            ))
+
+        return _ok(_Obj(
+            name=bucketName,
+            prefix=prefix,
+            marker=marker,
+            max_keys=max_keys,
+            delimiter=delimiter,
+            is_truncated=is_truncated,
+            next_marker=page[-1][0] if is_truncated and page else None,
+            contents=contents,
+            commonPrefixs=common_prefixes
+        ))
+
+    def copyObject(self, sourceBucketName, sourceObjectKey, destBucketName, destObjectKey, **kwargs):
+        source_path = self._path(sourceBucketName, sourceObjectKey)
+        if not os.path.isfile(source_path):
+            return _error(404, 'NoSuchKey', f"对象不存在: {sourceObjectKey}")
+        dest_path = self._path(destBucketName, destObjectKey)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copyfile(source_path, dest_path)
+        return _ok()
+
+    def deleteObject(self, bucketName, objectKey, **kwargs):
+        path = self._path(bucketName, objectKey)
+        if os.path.isfile(path):
+            os.remove(path)
+        return _ok(status=204)
+
+    def deleteObjects(self, bucketName, deleteObjectsRequest, **kwargs):
+        deleted = []
+        for obj in deleteObjectsRequest.objects:
+            self.deleteObject(bucketName, obj.key)
+            deleted.append(_Obj(key=obj.key))
+        return _ok(_Obj(deleted=deleted, error=[]))
+
+    def createSignedUrl(self, method, bucketName=None, objectKey=None, expires=300, **kwargs):
+        return _Obj(signedUrl=f"file://{self._path(bucketName, objectKey)}")
+
+    def close(self):
+        pass
@@ -0,0 +1,106 @@
+"""
+延迟统计模块
+固定分桶的延迟直方图，用于统计外部调用(OCR等)的单次耗时分布
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# 默认分桶上界(毫秒)
+DEFAULT_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """线程安全的延迟直方图"""
+
+    def __init__(self, name, buckets_ms=DEFAULT_BUCKETS_MS):
+        """
+        :param name: 指标名称
+        :param buckets_ms: 分桶上界(毫秒)，最后隐含一个+Inf桶
+        """
+        self.name = name
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.counts = [0] * (len(self.buckets_ms) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def observe(self, seconds):
+        """
+        记录一次耗时
+        :param seconds: 耗时(秒)
+        """
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    @contextmanager
+    def time(self):
+        """计时上下文管理器"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        获取统计快照
+        :return: {'count', 'avg_ms', 'max_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'buckets': {上界: 次数}}，
+                 分位数取所在分桶的上界
+        """
+        with self._lock:
+            return _summarize(self.buckets_ms, list(self.counts), self.count, self.total_ms, self.max_ms)
+
+
+def merge_snapshots(snapshots):
+    """
+    合并多个直方图快照(如多个工作进程的统计)
+    :param snapshots: snapshot()返回值列表，分桶需一致
+    :return: 合并后的快照
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot and snapshot.get('count')]
+    if not snapshots:
+        return _summarize(DEFAULT_BUCKETS_MS, [0] * (len(DEFAULT_BUCKETS_MS) + 1), 0, 0.0, 0.0)
+
+    bounds = list(snapshots[0]['buckets'].keys())
+    counts = [sum(snapshot['buckets'][bound] for snapshot in snapshots) for bound in bounds]
+    count = sum(snapshot['count'] for snapshot in snapshots)
+    total_ms = sum(snapshot['avg_ms'] * snapshot['count'] for snapshot in snapshots)
+    max_ms = max(snapshot['max_ms'] for snapshot in snapshots)
+    return _summarize(tuple(bounds[:-1]), counts, count, total_ms, max_ms)
+
+
+def _summarize(buckets_ms, counts, count, total_ms, max_ms):
+    bounds = list(buckets_ms) + ['+Inf']
+
+    def percentile(q):
+        if not count:
+            return 0.0
+        threshold = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(bounds, counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return max_ms if bound == '+Inf' else min(float(bound), max_ms)
+        return max_ms
+
+    return {
+        'count': count,
+        'avg_ms': total_ms / count if count else 0.0,
+        'max_ms': max_ms,
+        'p50_ms': percentile(0.5),
+        'p90_ms': percentile(0.9),
+        'p99_ms': percentile(0.99),
+        'buckets': dict(zip(bounds, counts))
+    }
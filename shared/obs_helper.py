@@ -3,19 +3,47 @@ OBS对象存储帮助模块
 封装华为云OBS操作
 """
 import os
-from obs import ObsClient
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from shared.config import Config
 
+# deleteObjects单次请求最多删除的对象数
+DELETE_BATCH_SIZE = 1000
+
 
 class OBSHelper:
     """华为云OBS操作封装"""
 
-    def __init__(self):
+    def __init__(self, client=None):
+        """
+        初始化
+        :param client: OBS客户端，默认云端模式创建ObsClient；
+                       本地模式默认不创建客户端，所有操作只打印模拟日志；OBS_LOCAL_STANDIN=true时使用本地目录替身
+        """
         self.bucket_name = Config.OBS_BUCKET_NAME
-        if Config.LOCAL_MODE:
-            self.client = None
-            print("运行在本地模式，OBS客户端未初始化")
+        self.part_size = Config.OBS_PART_SIZE
+        self.task_num = Config.OBS_TASK_NUM
+        self.multipart_threshold = Config.OBS_MULTIPART_THRESHOLD
+        self.enable_checkpoint = Config.OBS_ENABLE_CHECKPOINT
+        self._stats_lock = threading.Lock()
+        self.transfer_stats = {
+            'upload': {'count': 0, 'bytes': 0, 'seconds': 0.0},
+            'download': {'count': 0, 'bytes': 0, 'seconds': 0.0}
+        }
+
+        if client is not None:
+            self.client = client
+        elif Config.LOCAL_MODE:
+            if Config.OBS_LOCAL_STANDIN:
+                from shared.local_obs import LocalObsClient
+                self.client = LocalObsClient(os.path.join(Config.LOCAL_STORAGE_PATH, 'obs'))
+                print("运行在本地模式，使用本地目录模拟OBS")
+            else:
+                self.client = None
+                print("运行在本地模式，OBS客户端未初始化")
         else:
+            from obs import ObsClient
             self.client = ObsClient(
                 access_key_id=Config.HUAWEI_CLOUD_AK,
                 secret_access_key=Config.HUAWEI_CLOUD_SK,
@@ -23,15 +51,46 @@ class OBSHelper:
             )
 
     def upload_file(self, local_file_path, obs_key):
-        """上传文件到OBS"""
-        if Config.LOCAL_MODE:
+        """
+        上传文件到OBS
+        超过分段阈值的文件使用分段上传：多个分段并发上传，开启断点续传时中断后可从记录的分段继续
+        """
+        if self.client is None:
             print(f"[本地模式] 模拟上传: {local_file_path} -> {obs_key}")
             return True
 
         try:
-            resp = self.client.putFile(self.bucket_name, obs_key, local_file_path)
+            file_size = os.path.getsize(local_file_path)
+            start = time.time()
+            if file_size >= self.multipart_threshold:
+                resp = self.client.uploadFile(
+                    self.bucket_name, obs_key, local_file_path,
+                    partSize=self.part_size,
+                    taskNum=self.task_num,
+                    enableCheckpoint=self.enable_checkpoint
+                )
+            else:
+                resp = self.client.putFile(self.bucket_name, obs_key, local_file_path)
+
+            if resp.status < 300:
+                self._record_transfer('upload', obs_key, file_size, time.time() - start)
+                return True
+            else:
+                print(f"上传失败: {resp.errorCode} - {resp.errorMessage}")
+                return False
+        except Exception as e:
+            print(f"上传异常: {str(e)}")
+            return False
+
+    def put_content(self, obs_key, content):
+        """上传字符串/字节内容到OBS"""
+        if self.client is None:
+            print(f"[本地模式] 模拟上传内容: {obs_key}")
+            return True
+
+        try:
+            resp = self.client.putContent(self.bucket_name, obs_key, content)
             if resp.status < 300:
-                print(f"上传成功: {obs_key}")
                 return True
             else:
                 print(f"上传失败: {resp.errorCode} - {resp.errorMessage}")
@@ -40,19 +99,70 @@ class OBSHelper:
             print(f"上传异常: {str(e)}")
             return False
 
-    def download_file(self, obs_key, local_file_path):
-        """从OBS下载文件"""
-        if Config.LOCAL_MODE:
+    def append_object(self, obs_key, content, position=0):
+        """
+        追加写对象(条件写)
+        OBS只在position等于对象当前长度时才接受追加，否则返回409，
+        因此 position=0 的追加只有第一个调用者能成功，可用作分布式的"只执行一次"标记
+        :param obs_key: 对象键
+        :param content: 追加的内容
+        :param position: 追加位置，必须等于对象当前长度
+        :return: 是否追加成功
+        """
+        if self.client is None:
+            print(f"[本地模式] 模拟追加写: {obs_key}")
+            return True
+
+        try:
+            from obs import AppendObjectContent
+        except ImportError:
+            from shared.local_obs import AppendObjectContent
+
+        try:
+            append_content = AppendObjectContent()
+            append_content.content = content
+            append_content.position = position
+            resp = self.client.appendObject(self.bucket_name, obs_key, append_content)
+            if resp.status < 300:
+                return True
+            if resp.status != 409:
+                print(f"追加写失败: {resp.errorCode} - {resp.errorMessage}")
+            return False
+        except Exception as e:
+            print(f"追加写异常: {str(e)}")
+            return False
+
+    def download_file(self, obs_key, local_file_path, size=None):
+        """
+        从OBS下载文件
+        调用方给出的大小超过分段阈值时按分段并发执行范围下载，开启断点续传时中断后可从记录的分段继续；
+        其余情况用一次getObject直接写入文件，不做分段和断点记录(不为判断大小额外查询元数据)
+        :param obs_key: 对象键
+        :param local_file_path: 本地文件路径
+        :param size: 对象大小(字节)，已知时(如列举结果、OBS触发事件)传入，大对象据此走分段下载
+        """
+        if self.client is None:
             print(f"[本地模式] 模拟下载: {obs_key} -> {local_file_path}")
             return True
 
         try:
             # 确保目标目录存在
-            os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+            os.makedirs(os.path.dirname(os.path.abspath(local_file_path)), exist_ok=True)
+
+            start = time.time()
+            if size is not None and size >= self.multipart_threshold:
+                resp = self.client.downloadFile(
+                    self.bucket_name, obs_key,
+                    downloadFile=local_file_path,
+                    partSize=self.part_size,
+                    taskNum=self.task_num,
+                    enableCheckpoint=self.enable_checkpoint
+                )
+            else:
+                resp = self.client.getObject(self.bucket_name, obs_key, downloadPath=local_file_path)
 
-            resp = self.client.getObject(self.bucket_name, obs_key, downloadPath=local_file_path)
             if resp.status < 300:
-                print(f"下载成功: {obs_key}")
+                self._record_transfer('download', obs_key, os.path.getsize(local_file_path), time.time() - start)
                 return True
             else:
                 print(f"下载失败: {resp.errorCode} - {resp.errorMessage}")
@@ -61,26 +171,104 @@ class OBSHelper:
             print(f"下载异常: {str(e)}")
             return False
 
-    def list_objects(self, prefix=''):
-        """列出OBS中的对象"""
-        if Config.LOCAL_MODE:
+    def get_transfer_stats(self):
+        """
+        获取传输统计
+        :return: 上传/下载各自的次数、字节数、耗时和平均吞吐(MB/s)
+        """
+        with self._stats_lock:
+            stats = {direction: dict(values) for direction, values in self.transfer_stats.items()}
+        for values in stats.values():
+            values['throughput_mbps'] = values['bytes'] / 1024 / 1024 / values['seconds'] if values['seconds'] else 0.0
+        return stats
+
+    def _record_transfer(self, direction, obs_key, size, seconds):
+        with self._stats_lock:
+            stats = self.transfer_stats[direction]
+            stats['count'] += 1
+            stats['bytes'] += size
+            stats['seconds'] += seconds
+        throughput = size / 1024 / 1024 / seconds if seconds else 0.0
+        action = '上传' if direction == 'upload' else '下载'
+        print(f"{action}成功: {obs_key} ({size / 1024 / 1024:.1f}MB, {seconds:.2f}s, {throughput:.1f}MB/s)")
+
+    def iter_objects(self, prefix='', delimiter=None, with_metadata=False, page_size=1000):
+        """
+        按marker分页遍历OBS中的对象(生成器)，每次只在内存中保留一页
+        :param prefix: 对象键前缀
+        :param delimiter: 分隔符，指定后前缀下更深层的对象折叠为公共前缀(以分隔符结尾的字符串)返回
+        :param with_metadata: 为True时返回dict {'key', 'size', 'etag', 'last_modified'}，
+                              公共前缀返回 {'key', 'is_prefix': True}
+        :param page_size: 每页最大对象数(不超过1000)
+        :return: 对象键或对象信息的生成器
+        """
+        if self.client is None:
             print(f"[本地模式] 模拟列出对象: {prefix}")
-            return []
+            return
+
+        marker = None
+        while True:
+            resp = self.client.listObjects(
+                self.bucket_name, prefix=prefix, marker=marker, max_keys=page_size, delimiter=delimiter
+            )
+            if resp.status >= 300:
+                raise RuntimeError(f"列表失败: {resp.errorCode} - {resp.errorMessage}")
+
+            body = resp.body
+            for obj in body.contents or []:
+                if with_metadata:
+                    yield {
+                        'key': obj.key,
+                        'size': obj.size,
+                        'etag': obj.etag,
+                        'last_modified': obj.lastModified
+                    }
+                else:
+                    yield obj.key
+
+            for common_prefix in getattr(body, 'commonPrefixs', None) or []:
+                yield {'key': common_prefix.prefix, 'is_prefix': True} if with_metadata else common_prefix.prefix
+
+            if not body.is_truncated:
+                return
 
+            # 未指定delimiter时OBS不返回next_marker，使用本页最后一个对象键
+            marker = body.next_marker or (body.contents[-1].key if body.contents else None)
+            if not marker:
+                return
+
+    def list_objects(self, prefix='', delimiter=None, with_metadata=False):
+        """列出OBS中的全部对象(自动翻页)"""
         try:
-            resp = self.client.listObjects(self.bucket_name, prefix=prefix)
-            if resp.status < 300:
-                return [obj.key for obj in resp.body.contents]
-            else:
-                print(f"列表失败: {resp.errorCode} - {resp.errorMessage}")
-                return []
+            return list(self.iter_objects(prefix=prefix, delimiter=delimiter, with_metadata=with_metadata))
         except Exception as e:
             print(f"列表异常: {str(e)}")
             return []
 
+    def copy_object(self, source_key, dest_key):
+        """
+        在桶内服务端复制对象(数据不经过本地)
+        :param source_key: 源对象键
+        :param dest_key: 目标对象键
+        :return: 是否复制成功
+        """
+        if self.client is None:
+            print(f"[本地模式] 模拟复制: {source_key} -> {dest_key}")
+            return True
+
+        try:
+            resp = self.client.copyObject(self.bucket_name, source_key, self.bucket_name, dest_key)
+            if resp.status < 300:
+                return True
+            print(f"复制失败: {resp.errorCode} - {resp.errorMessage}")
+            return False
+        except Exception as e:
+            print(f"复制异常: {str(e)}")
+            return False
+
     def delete_object(self, obs_key):
         """删除OBS中的对象"""
-        if Config.LOCAL_MODE:
+        if self.client is None:
             print(f"[本地模式] 模拟删除: {obs_key}")
             return True
 
@@ -96,9 +284,74 @@ class OBSHelper:
             print(f"删除异常: {str(e)}")
             return False
 
+    def upload_many(self, items, max_workers=None):
+        """
+        并发上传多个文件
+        :param items: [(local_file_path, obs_key), ...]
+        :param max_workers: 最大并发数，默认OBS_BATCH_WORKERS
+        :return: {obs_key: 是否成功}，顺序与输入一致
+        """
+        results = self._run_many(lambda item: self.upload_file(*item), items, max_workers)
+        return {obs_key: success for (_, obs_key), success in zip(items, results)}
+
+    def download_many(self, items, max_workers=None):
+        """
+        并发下载多个对象
+        :param items: [(obs_key, local_file_path), ...] 或 [(obs_key, local_file_path, size), ...]
+        :param max_workers: 最大并发数，默认OBS_BATCH_WORKERS
+        :return: {obs_key: 是否成功}，顺序与输入一致
+        """
+        results = self._run_many(lambda item: self.download_file(*item), items, max_workers)
+        return {item[0]: success for item, success in zip(items, results)}
+
+    def delete_many(self, obs_keys):
+        """
+        批量删除对象，每次deleteObjects请求最多删除1000个
+        :param obs_keys: 对象键列表
+        :return: {obs_key: 是否成功}
+        """
+        if self.client is None:
+            print(f"[本地模式] 模拟批量删除: {len(obs_keys)} 个对象")
+            return {obs_key: True for obs_key in obs_keys}
+
+        try:
+            from obs import DeleteObjectsRequest, Object
+        except ImportError:
+            from shared.local_obs import DeleteObjectsRequest, Object
+
+        results = {}
+        for start in range(0, len(obs_keys), DELETE_BATCH_SIZE):
+            batch = obs_keys[start:start + DELETE_BATCH_SIZE]
+            try:
+                request = DeleteObjectsRequest(quiet=False, objects=[Object(key=obs_key) for obs_key in batch])
+                resp = self.client.deleteObjects(self.bucket_name, request)
+                if resp.status >= 300:
+                    print(f"批量删除失败: {resp.errorCode} - {resp.errorMessage}")
+                    results.update({obs_key: False for obs_key in batch})
+                    continue
+
+                deleted = {item.key for item in (resp.body.deleted or [])}
+                for item in (resp.body.error or []):
+                    print(f"删除失败: {item.key} - {getattr(item, 'code', '')} {getattr(item, 'message', '')}")
+                results.update({obs_key: obs_key in deleted for obs_key in batch})
+            except Exception as e:
+                print(f"批量删除异常: {str(e)}")
+                results.update({obs_key: False for obs_key in batch})
+
+        print(f"批量删除完成: {sum(results.values())}/{len(obs_keys)}")
+        return results
+
+    def _run_many(self, func, items, max_workers=None):
+        """用有界线程池并发执行，结果顺序与输入一致"""
+        if not items:
+            return []
+        max_workers = min(max_workers or Config.OBS_BATCH_WORKERS, len(items))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+
     def get_download_url(self, obs_key, expires=3600):
         """生成下载URL(签名URL)"""
-        if Config.LOCAL_MODE:
+        if self.client is None:
             return f"file://{obs_key}"
 
         try:
@@ -0,0 +1,254 @@
+"""
+OCR结果缓存模块
+以帧图像内容哈希为键缓存OCR结果，支持内存LRU、本地磁盘和OBS三级存储
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from shared.config import Config
+
+
+# get_stats中可以累加的计数
+_COUNTERS = ('memory_hits', 'disk_hits', 'obs_hits', 'misses', 'puts', 'evictions')
+
+
+class OCRCache:
+    """内容寻址的OCR结果缓存"""
+
+    def __init__(self, max_entries=None, disk_dir=None, obs_prefix=None):
+        """
+        初始化
+        :param max_entries: 内存LRU最大条目数
+        :param disk_dir: 磁盘缓存目录，为空时不启用磁盘层
+        :param obs_prefix: OBS缓存前缀(如 'ocr-cache/')，为空时不启用OBS层
+        """
+        self.max_entries = max_entries if max_entries is not None else Config.OCR_CACHE_MAX_ENTRIES
+        self.disk_dir = disk_dir if disk_dir is not None else Config.OCR_CACHE_DIR
+        self.obs_prefix = obs_prefix if obs_prefix is not None else Config.OCR_CACHE_OBS_PREFIX
+        self._obs_helper = None
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'obs_hits': 0,
+            'misses': 0,
+            'puts': 0,
+            'evictions': 0
+        }
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image, namespace=''):
+        """
+        计算缓存键：图像尺寸、类型与原始像素字节的SHA-256
+        :param image: OpenCV图像(numpy array)
+        :param namespace: 命名空间(OCR引擎、置信度阈值等影响结果的配置)
+        :return: 十六进制哈希字符串
+        """
+        digest = hashlib.sha256()
+        digest.update(namespace.encode('utf-8'))
+        digest.update(f"{image.shape}|{image.dtype}".encode('utf-8'))
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        查询缓存，下层命中时回填到内存层
+        :param key: 缓存键
+        :return: OCR结果列表，未命中返回None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+
+        results = self._disk_get(key)
+        if results is not None:
+            self._count('disk_hits')
+        else:
+            results = self._obs_get(key)
+            if results is not None:
+                self._count('obs_hits')
+                self._disk_put(key, results)
+
+        if results is None:
+            self._count('misses')
+            return None
+
+        self._memory_put(key, results)
+        return results
+
+    def put(self, key, results):
+        """
+        写入缓存(所有已启用的层)
+        :param key: 缓存键
+        :param results: OCR结果列表
+        """
+        self._count('puts')
+        self._memory_put(key, results)
+        self._disk_put(key, results)
+        self._obs_put(key, results)
+
+    def get_stats(self):
+        """
+        获取命中统计
+        :return: 各层命中数、未命中数及命中率
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._memory)
+        return _with_hit_ratio(stats)
+
+    def clear(self):
+        """清空内存层"""
+        with self._lock:
+            self._memory.clear()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _memory_put(self, key, results):
+        with self._lock:
+            self._memory[key] = results
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return _decode(json.load(f))
+        except Exception as e:
+            print(f"读取OCR磁盘缓存失败: {e}")
+            return None
+
+    def _disk_put(self, key, results):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，避免并发读到半个文件
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"写入OCR磁盘缓存失败: {e}")
+
+    def _get_obs_helper(self):
+        if self._obs_helper is None:
+            from shared.obs_helper import OBSHelper
+            self._obs_helper = OBSHelper()
+        return self._obs_helper
+
+    def _obs_get(self, key):
+        if not self.obs_prefix:
+            return None
+        temp_path = os.path.join(tempfile.gettempdir(), f"ocr_cache_{key}.json")
+        try:
+            if not self._get_obs_helper().download_file(f"{self.obs_prefix}{key}.json", temp_path):
+                return None
+            if not os.path.exists(temp_path):
+                return None
+            with open(temp_path, 'r', encoding='utf-8') as f:
+                return _decode(json.load(f))
+        except Exception as e:
+            print(f"读取OCR OBS缓存失败: {e}")
+            return None
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _obs_put(self, key, results):
+        if not self.obs_prefix:
+            return
+        temp_path = os.path.join(tempfile.gettempdir(), f"ocr_cache_{key}.json")
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False)
+            self._get_obs_helper().upload_file(temp_path, f"{self.obs_prefix}{key}.json")
+        except Exception as e:
+            print(f"写入OCR OBS缓存失败: {e}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def diff_cache_stats(after, before):
+    """
+    计算两次get_stats之间的计数增量(缓存在进程内共享、计数持续累加，用于取出单个切片的统计)
+    :param after: 处理后的统计
+    :param before: 处理前的统计
+    :return: 增量统计，entries取处理后的值
+    """
+    if not after:
+        return {}
+    stats = {key: value - before.get(key, 0) for key, value in after.items() if key in _COUNTERS}
+    stats['entries'] = after.get('entries', 0)
+    return _with_hit_ratio(stats)
+
+
+def merge_cache_stats(stats_list):
+    """
+    合并多个缓存统计(如多个工作进程的统计)，计数相加后重新计算命中率
+    :param stats_list: get_stats()或diff_cache_stats()返回值列表
+    :return: 合并后的统计，没有可合并的统计时返回空dict
+    """
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return {}
+    stats = {key: sum(item.get(key, 0) for item in stats_list) for key in _COUNTERS}
+    stats['entries'] = max(item.get('entries', 0) for item in stats_list)
+    return _with_hit_ratio(stats)
+
+
+def _with_hit_ratio(stats):
+    hits = stats['memory_hits'] + stats['disk_hits'] + stats['obs_hits']
+    lookups = hits + stats['misses']
+    stats['hit_ratio'] = hits / lookups if lookups else 0.0
+    return stats
+
+
+def _decode(results):
+    """JSON反序列化后把bbox和行编号恢复为元组"""
+    for item in results:
+        item['bbox'] = tuple(item['bbox'])
+        if item.get('line') is not None:
+            item['line'] = tuple(item['line'])
+    return results
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """
+    获取进程级共享缓存
+    FunctionGraph实例复用时缓存随进程保留，同一进程内的多个OCRService共享命中
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = OCRCache()
+        return _shared_cache
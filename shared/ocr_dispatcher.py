@@ -0,0 +1,142 @@
+"""
+OCR并发调度模块
+云端OCR的耗时主要是网络往返，用有界线程池同时保持多个请求在途，
+令牌桶限制请求速率不超过API配额，被限流时按指数退避重试
+"""
+import time
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from shared.config import Config
+from shared.ocr_service import OCRThrottledError
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: 每秒补充的令牌数(即平均请求速率)
+        :param capacity: 桶容量(允许的突发请求数)，默认等于rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，桶空时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter():
+    """
+    获取进程级共享的OCR限速器，同一进程内的所有调度器共用API配额
+    :return: TokenBucket，OCR_RATE_LIMIT<=0时返回None(不限速)
+    """
+    global _shared_limiter
+    if Config.OCR_RATE_LIMIT <= 0:
+        return None
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucket(Config.OCR_RATE_LIMIT, Config.OCR_RATE_BURST or None)
+        return _shared_limiter
+
+
+class OCRDispatcher:
+    """OCR调度器：并发提交OCR请求，按提交顺序取回结果"""
+
+    def __init__(self, ocr_service, concurrency=1, rate_limiter=None, max_retries=None, backoff=None):
+        """
+        初始化
+        :param ocr_service: 提供 extract_text(image, offset, raise_on_throttle) 的OCR服务
+        :param concurrency: 同时在途的请求数，1时在调用线程内同步执行
+        :param rate_limiter: 限速器(TokenBucket)，None表示不限速
+        :param max_retries: 被限流时的最大重试次数，用尽后最后一次允许OCRService降级处理
+        :param backoff: 首次退避时间(秒)，之后每次翻倍并加随机抖动
+        """
+        self.ocr_service = ocr_service
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = rate_limiter
+        self.max_retries = Config.OCR_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = Config.OCR_RETRY_BACKOFF if backoff is None else backoff
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'retries': 0}
+
+    def submit(self, image, offset=None):
+        """
+        提交一次OCR请求
+        :param image: OpenCV图像
+        :param offset: 裁剪区域在整帧中的偏移
+        :return: Future，结果为OCR结果列表
+        """
+        if self.concurrency == 1:
+            future = Future()
+            try:
+                future.set_result(self._extract(image, offset))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ocr')
+        return self._executor.submit(self._extract, image, offset)
+
+    def map(self, images):
+        """
+        并发识别多张图像
+        :param images: 图像的可迭代对象
+        :return: OCR结果列表的列表，顺序与输入一致
+        """
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+
+    def get_stats(self):
+        """获取请求、限流和重试次数"""
+        with self._lock:
+            return dict(self.stats)
+
+    def shutdown(self):
+        """关闭线程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _extract(self, image, offset):
+        """限速 + 限流退避重试"""
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            self._count('requests')
+            try:
+                return self.ocr_service.extract_text(image, offset, raise_on_throttle=attempt < self.max_retries)
+            except OCRThrottledError:
+                self._count('throttled')
+                delay = self.backoff * (2 ** attempt)
+                delay += random.uniform(0, delay)
+                print(f"OCR请求被限流，{delay:.2f}秒后重试({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+                self._count('retries')
@@ -0,0 +1,134 @@
+"""
+OCR图像预处理模块
+送入OCR引擎前做灰度化、按文字高度自适应缩小、可选二值化，并控制云端上传的编码格式和质量；
+识别结果的边界框再换算回原图坐标。高分辨率录屏的文字远大于识别所需，缩小后上传体积和Tesseract耗时都明显下降
+"""
+import math
+import statistics
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from shared.config import Config
+
+# 缩放比例按1/8向上量化(文字不低于目标高度)，避免文字高度估计的微小波动导致每帧缩放尺寸都不同
+SCALE_STEPS = 8
+
+
+class OCRPreprocessor:
+    """OCR预处理器：根据近期识别出的文字高度估计缩放比例"""
+
+    def __init__(self, grayscale=None, target_text_height=None, max_side=None, binarize=None,
+                 image_format=None, quality=None, history=200):
+        """
+        初始化(参数默认取自Config)
+        :param grayscale: 是否转为灰度图
+        :param target_text_height: 缩放后的目标文字高度(像素)，0表示不按文字高度缩放。
+                                   比例取自近期文字高度的中位数：大标题占多数时小字会被缩到难以识别，
+                                   并发识别时中位数还取决于结果返回的顺序，同一视频多次处理的结果可能不同，因此默认关闭
+        :param max_side: 图像长边上限(像素)，0表示不限制
+        :param binarize: 是否做Otsu二值化
+        :param image_format: 云端上传的编码格式 'jpg' 或 'webp'
+        :param quality: 编码质量(1-100)
+        :param history: 用于估计文字高度的最近边界框数量
+        """
+        self.grayscale = Config.OCR_GRAYSCALE if grayscale is None else grayscale
+        self.target_text_height = Config.OCR_TARGET_TEXT_HEIGHT if target_text_height is None else target_text_height
+        self.max_side = Config.OCR_MAX_SIDE if max_side is None else max_side
+        self.binarize = Config.OCR_BINARIZE if binarize is None else binarize
+        self.image_format = (image_format or Config.OCR_IMAGE_FORMAT).lower().lstrip('.')
+        self.quality = Config.OCR_IMAGE_QUALITY if quality is None else quality
+        self._heights = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def cache_tag(self):
+        """
+        影响识别结果的预处理配置，拼入OCR缓存命名空间
+        自适应缩放比例随已识别内容变化，不计入；结果已换算回原图坐标，不同比例下的缓存结果可以通用
+        """
+        return (f"gray={int(bool(self.grayscale))}|h={self.target_text_height}|max={self.max_side}"
+                f"|bin={int(bool(self.binarize))}|{self.image_format}{self.quality}")
+
+    def reset(self):
+        """清空文字高度估计(开始处理新视频时调用)"""
+        with self._lock:
+            self._heights.clear()
+
+    def text_height(self):
+        """近期文字高度的中位数(原图像素)，尚无识别结果时返回None"""
+        with self._lock:
+            if not self._heights:
+                return None
+            return statistics.median(self._heights)
+
+    def scale_for(self, image):
+        """
+        计算缩放比例(只缩小不放大)
+        :param image: 原图
+        :return: 缩放比例(0, 1]
+        """
+        scale = 1.0
+        height = self.text_height()
+        if self.target_text_height and height:
+            scale = min(scale, self.target_text_height / height)
+        if self.max_side:
+            scale = min(scale, self.max_side / max(image.shape[:2]))
+        if scale >= 1.0:
+            return 1.0
+        return min(SCALE_STEPS, max(1, math.ceil(scale * SCALE_STEPS))) / SCALE_STEPS
+
+    def prepare(self, image):
+        """
+        预处理图像
+        :param image: OpenCV图像(BGR或灰度)
+        :return: (处理后的图像, 缩放比例)
+        """
+        if not isinstance(image, np.ndarray):
+            return image, 1.0
+
+        if (self.grayscale or self.binarize) and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        scale = self.scale_for(image)
+        if scale < 1.0:
+            size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+        if self.binarize:
+            _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        return image, scale
+
+    def restore(self, results, scale):
+        """
+        把识别结果的边界框换算回原图坐标，并记录文字高度
+        :param results: OCR结果列表(原地修改)
+        :param scale: prepare返回的缩放比例
+        :return: results
+        """
+        if scale != 1.0:
+            for item in results:
+                x, y, w, h = item['bbox']
+                item['bbox'] = (round(x / scale), round(y / scale), round(w / scale), round(h / scale))
+
+        heights = [item['bbox'][3] for item in results if item['bbox'][3] > 0]
+        if heights:
+            with self._lock:
+                self._heights.extend(heights)
+        return results
+
+    def encode(self, image):
+        """
+        按配置的格式和质量编码图像(用于云端上传)
+        :param image: 预处理后的图像
+        :return: 编码后的字节
+        """
+        if self.image_format == 'webp':
+            ext, params = '.webp', [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        else:
+            ext, params = '.jpg', [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+
+        ok, buffer = cv2.imencode(ext, image, params)
+        if not ok:
+            raise ValueError(f"图像编码失败: {ext}")
+        return buffer.tobytes()
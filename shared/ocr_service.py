@@ -2,65 +2,171 @@
 OCR服务抽象层
 支持本地Tesseract和华为云OCR无缝切换
 """
-import os
 import cv2
 import numpy as np
 import base64
+import itertools
+import threading
 from shared.config import Config
+from shared.ocr_cache import get_shared_cache
+from shared.metrics import LatencyHistogram
+from shared.ocr_preprocess import OCRPreprocessor
+from shared.tesseract_pool import TesseractPool
+
+_huawei_client = None
+_huawei_client_lock = threading.Lock()
+
+# 华为云API网关的流控错误码
+THROTTLE_ERROR_CODES = {'APIG.0308', 'APIG.1009'}
+
+
+class OCRThrottledError(Exception):
+    """OCR请求被服务端限流"""
+
+
+def is_throttled(error):
+    """判断异常是否为服务端限流(HTTP 429或API网关流控错误码)"""
+    return getattr(error, 'status_code', None) == 429 or getattr(error, 'error_code', None) in THROTTLE_ERROR_CODES
+
+
+def get_huawei_ocr_client():
+    """
+    获取进程级复用的华为云OcrClient
+    客户端内部的HTTP会话保持长连接，FunctionGraph实例复用时跨调用保留，避免每帧重新建立TLS连接
+    """
+    global _huawei_client
+    with _huawei_client_lock:
+        if _huawei_client is None:
+            from huaweicloudsdkcore.auth.credentials import BasicCredentials
+            from huaweicloudsdkcore.http.http_config import HttpConfig
+            from huaweicloudsdkocr.v1.region.ocr_region import OcrRegion
+            from huaweicloudsdkocr.v1 import OcrClient
+
+            http_config = HttpConfig.get_default_config()
+            http_config.timeout = (Config.OCR_CONNECT_TIMEOUT, Config.OCR_READ_TIMEOUT)
+            # 连接池大小(较新版本的SDK支持)，与并发识别数匹配，避免连接被反复创建和丢弃
+            if hasattr(http_config, 'pool_connections'):
+                http_config.pool_connections = Config.OCR_HTTP_POOL_SIZE
+            if hasattr(http_config, 'pool_maxsize'):
+                http_config.pool_maxsize = Config.OCR_HTTP_POOL_SIZE
+
+            credentials = BasicCredentials(Config.HUAWEI_CLOUD_AK, Config.HUAWEI_CLOUD_SK, Config.OCR_PROJECT_ID or None)
+            builder = OcrClient.new_builder() \
+                .with_http_config(http_config) \
+                .with_credentials(credentials)
+            # 配置了OCR_ENDPOINT时直接访问该地址(如压测用的模拟服务)，否则按区域取官方地址；
+            # SDK构建时区域会覆盖endpoint，两者只能设置其一
+            if Config.OCR_ENDPOINT:
+                builder = builder.with_endpoints([Config.OCR_ENDPOINT])
+            else:
+                builder = builder.with_region(OcrRegion.value_of(Config.HUAWEI_CLOUD_REGION))
+            _huawei_client = builder.build()
+        return _huawei_client
 
 
 class OCRService:
     """OCR服务 - 自动选择本地或云端"""
 
-    def __init__(self):
+    def __init__(self, cache=None, preprocessor=None):
+        """
+        初始化
+        :param cache: OCRCache实例，默认使用进程级共享缓存(OCR_CACHE_ENABLED=false时不缓存)
+        :param preprocessor: OCRPreprocessor实例，默认按Config创建
+        """
         self.use_cloud = not Config.LOCAL_MODE
         print(f"OCR模式: {'华为云OCR' if self.use_cloud else '本地Tesseract'}")
 
-    def extract_text(self, image):
+        self.preprocessor = preprocessor or OCRPreprocessor()
+        self.cache = cache or (get_shared_cache() if Config.OCR_CACHE_ENABLED else None)
+        # 影响识别结果的配置作为缓存命名空间，配置变化时不会误命中
+        self._cache_namespace = (f"{'huawei' if self.use_cloud else 'tesseract'}|{Config.OCR_CONFIDENCE_THRESHOLD}"
+                                 f"|{self.preprocessor.cache_tag()}")
+        # 本地Tesseract工作池(云端模式下只在降级时用到)
+        self.tesseract = TesseractPool()
+        self._local = threading.local()
+        self._call_seq = itertools.count()
+        # 单次OCR引擎调用的耗时分布(缓存命中不计入)
+        self.latency = LatencyHistogram('ocr')
+
+    @property
+    def last_error(self):
+        """当前线程最近一次OCR调用的错误(并发调用时互不影响)"""
+        return getattr(self._local, 'last_error', None)
+
+    @last_error.setter
+    def last_error(self, error):
+        self._local.last_error = error
+
+    def get_cache_stats(self):
+        """获取OCR缓存统计"""
+        return self.cache.get_stats() if self.cache else {}
+
+    def get_latency_stats(self):
+        """获取OCR调用耗时分布"""
+        return self.latency.snapshot()
+
+    def extract_text(self, image, offset=None, raise_on_throttle=False):
         """
         统一的OCR接口
-        :param image: OpenCV图像(numpy array)
-        :return: OCR结果列表 [{'text': str, 'confidence': float, 'bbox': tuple}, ...]
+        :param image: OpenCV图像(numpy array)，可以是整帧中裁剪出的区域
+        :param offset: 裁剪区域左上角在整帧中的坐标(x, y)，用于把边界框换算回整帧坐标
+        :param raise_on_throttle: 云端限流时抛出OCRThrottledError(由调用方退避重试)，而不是降级到本地Tesseract
+        :return: OCR结果列表 [{'text': str, 'confidence': float, 'bbox': tuple, ['line': tuple]}, ...]
         """
-        if self.use_cloud:
-            return self._huawei_ocr(image)
-        else:
-            return self._tesseract_ocr(image)
+        cache_key = None
+        results = None
+        if self.cache is not None and isinstance(image, np.ndarray):
+            cache_key = self.cache.make_key(image, self._cache_namespace)
+            results = self.cache.get(cache_key)
+
+        if results is None:
+            self.last_error = None
+            # 预处理(灰度、缩小等)后识别，边界框换算回原图坐标
+            processed, scale = self.preprocessor.prepare(image)
+            with self.latency.time():
+                if self.use_cloud:
+                    results = self._huawei_ocr(processed, raise_on_throttle)
+                else:
+                    results = self._tesseract_ocr(processed)
+            results = self.preprocessor.restore(results, scale)
+
+            # 识别出错时的空结果不写入缓存
+            if cache_key is not None and self.last_error is None:
+                self.cache.put(cache_key, results)
+
+        # 返回副本，避免坐标换算修改缓存中的结果
+        results = [dict(item) for item in results]
+
+        # 行编号只在单次识别内有效，加上调用序号，避免不同调用中编号相同的单词被并成同一行段(跨调用按位置拼行)
+        call_id = next(self._call_seq)
+        for item in results:
+            if item.get('line') is not None:
+                item['line'] = (call_id,) + tuple(item['line'])
+
+        if offset:
+            dx, dy = offset
+            for item in results:
+                x, y, w, h = item['bbox']
+                item['bbox'] = (x + dx, y + dy, w, h)
+
+        return results
 
     def _tesseract_ocr(self, image):
         """本地Tesseract OCR"""
         try:
-            import pytesseract
             from PIL import Image
 
-            # 尝试配置Tesseract路径
-            tesseract_paths = [
-                r'D:\Tesseract\tesseract.exe',  # 用户自定义路径
-                r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-                r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
-                r'C:\Windows\System32\tesseract.exe',
-                '/usr/bin/tesseract',
-                '/usr/local/bin/tesseract'
-            ]
-
-            for path in tesseract_paths:
-                if os.path.exists(path):
-                    pytesseract.pytesseract.tesseract_cmd = path
-                    break
-
             # 转换图像格式
-            if isinstance(image, np.ndarray):
+            if isinstance(image, np.ndarray) and image.ndim == 2:
+                pil_image = Image.fromarray(image)
+            elif isinstance(image, np.ndarray):
                 image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
                 pil_image = Image.fromarray(image_rgb)
             else:
                 pil_image = image
 
             # OCR识别
-            data = pytesseract.image_to_data(
-                pil_image,
-                lang='eng+chi_sim',
-                output_type=pytesseract.Output.DICT
-            )
+            data = self.tesseract.image_to_data(pil_image)
 
             # 格式化结果
             results = []
@@ -78,6 +184,12 @@ class OCRService:
                             data['top'][i],
                             data['width'][i],
                             data['height'][i]
+                        ),
+                        # Tesseract的行编号，用于把单词重新组合成文本行
+                        'line': (
+                            data['block_num'][i],
+                            data['par_num'][i],
+                            data['line_num'][i]
                         )
                     })
 
@@ -85,25 +197,18 @@ class OCRService:
 
         except Exception as e:
             print(f"Tesseract OCR错误: {e}")
+            self.last_error = e
             return []
 
-    def _huawei_ocr(self, image):
+    def _huawei_ocr(self, image, raise_on_throttle=False):
         """华为云OCR服务"""
         try:
-            from huaweicloudsdkcore.auth.credentials import BasicCredentials
-            from huaweicloudsdkocr.v1.region.ocr_region import OcrRegion
-            from huaweicloudsdkocr.v1 import OcrClient, RecognizeGeneralTextRequest, GeneralTextRequestBody
+            from huaweicloudsdkocr.v1 import RecognizeGeneralTextRequest, GeneralTextRequestBody
 
-            # 初始化客户端
-            credentials = BasicCredentials(Config.HUAWEI_CLOUD_AK, Config.HUAWEI_CLOUD_SK)
-            client = OcrClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(OcrRegion.value_of(Config.HUAWEI_CLOUD_REGION)) \
-                .build()
+            client = get_huawei_ocr_client()
 
-            # 将图像转为base64
-            _, buffer = cv2.imencode('.jpg', image)
-            image_base64 = base64.b64encode(buffer).decode('utf-8')
+            # 按配置的格式和质量编码后转为base64
+            image_base64 = base64.b64encode(self.preprocessor.encode(image)).decode('utf-8')
 
             # 调用通用文字识别API
             request = RecognizeGeneralTextRequest()
@@ -139,7 +244,10 @@ class OCRService:
             return results
 
         except Exception as e:
+            if raise_on_throttle and is_throttled(e):
+                raise OCRThrottledError(str(e)) from e
             print(f"华为云OCR错误: {e}")
+            self.last_error = e
             import traceback
             traceback.print_exc()
             # 如果云端失败，降级到本地
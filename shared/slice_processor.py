@@ -0,0 +1,201 @@
+"""
+切片流式处理模块
+每个切片只解码一次：边解码边扫描采样帧，并在同一趟中写出脱敏后的视频
+"""
+import os
+import cv2
+from collections import deque
+from shared.config import Config
+
+
+class StreamingSliceProcessor:
+    """流式切片处理器 - 单次解码完成扫描与脱敏"""
+
+    def __init__(self, scanner, masker, interval=1.0, method='blur', max_prefix_seconds=None):
+        """
+        初始化
+        :param scanner: DLPScanner实例
+        :param masker: SensitiveInfoMasker实例
+        :param interval: 采样间隔(秒)，与原extract_keyframes一致
+        :param method: 脱敏方法 'blur' 或 'mosaic'
+        :param max_prefix_seconds: 延迟创建写入器的最长时间(秒)，默认取Config.LAZY_WRITE_MAX_SECONDS，0为不限制
+        """
+        self.scanner = scanner
+        self.masker = masker
+        self.interval = interval
+        self.method = method
+        self.max_prefix_seconds = Config.LAZY_WRITE_MAX_SECONDS if max_prefix_seconds is None else max_prefix_seconds
+
+    def process(self, input_path, output_path):
+        """
+        处理单个切片
+        采样帧位于每个采样区间的起点，区间内的后续帧沿用该采样帧的检测结果，
+        因此只需保留当前区间的检测结果，无需缓存整段关键帧。
+        切片在出现第一个敏感帧之前不创建写入器，非采样帧只grab()不解码；
+        一旦需要脱敏，再重新解码并补写此前的帧，保证无敏感信息的切片完全不编码。
+        写入器创建之前，采样帧的OCR可以并发在途(最多scanner.max_in_flight帧)，结果按帧顺序取回；
+        创建之后逐帧同步扫描，避免为等待OCR结果而缓存待写出的帧。
+
+        延迟写出的代价是补写时重复解码整段前缀：敏感帧出现得越晚，重复解码越多，最坏接近整个切片解码两次。
+        因此延迟有上限：到max_prefix_seconds仍未发现敏感信息时也开始写出，之后单趟边解码边写，
+        补写量不超过该时长。代价是之后才出现敏感信息或始终没有敏感信息的切片多编码一次(后者的输出会被删除)，
+        且开始写出后OCR不再并发在途；切片较短、敏感信息多在开头出现时可调大该值，0为不限制
+
+        :param input_path: 输入切片路径
+        :param output_path: 输出切片路径(仅在发现敏感信息时写出)
+        :return: {'scan_results': [...], 'masked': bool, 'frame_count': int, 'keyframe_count': int}
+                 scan_results结构: [{'frame_id', 'timestamp', 'scan_result'}, ...]
+        """
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            raise Exception(f"无法打开视频文件: {input_path}")
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_interval = max(1, int(fps * self.interval))
+        max_in_flight = getattr(self.scanner, 'max_in_flight', 1)
+        max_prefix_frames = int(fps * self.max_prefix_seconds) if self.max_prefix_seconds > 0 else 0
+
+        writer = None
+        scan_results = []
+        pending = deque()  # 已提交、尚未取回的采样帧 (keyframe_id, timestamp, scan)
+        current_detections = None
+        frame_count = 0
+        keyframe_id = 0
+
+        def collect():
+            """按顺序取回最早提交的采样帧，返回其检测结果(无敏感信息时为None)"""
+            frame_id, timestamp, scan = pending.popleft()
+            scan_result = scan.result()
+            if scan_result['sensitive_count'] == 0:
+                return None
+            scan_results.append({
+                'frame_id': frame_id,
+                'timestamp': timestamp,
+                'scan_result': scan_result
+            })
+            print(f"  ⚠️  帧 {frame_id} 发现 {scan_result['sensitive_count']} 个敏感信息!")
+            return scan_result['detections']
+
+        def start_writing():
+            """取回全部在途结果，创建写入器并补写此前的frame_count帧，返回当前区间的检测结果"""
+            nonlocal writer
+            while pending:
+                collect()
+            writer = self._open_writer(output_path, fps, width, height)
+            self._copy_prefix(input_path, writer, frame_count, frame_interval, scan_results)
+            return self._detections_at(scan_results, keyframe_id - 1)
+
+        try:
+            while True:
+                is_sample = frame_count % frame_interval == 0
+
+                # 延迟写出到达上限：开始写出，限制补写时的重复解码量
+                if writer is None and max_prefix_frames and frame_count >= max_prefix_frames:
+                    current_detections = start_writing()
+
+                # 尚未开始写出时，非采样帧只grab()不解码
+                if writer is None and not is_sample:
+                    if not cap.grab():
+                        break
+                    frame_count += 1
+                    continue
+
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                # 采样点：提交扫描，更新当前区间的检测结果
+                if is_sample:
+                    timestamp = frame_count / fps
+                    print(f"扫描帧 {keyframe_id} (时间={timestamp:.2f}s)...")
+                    pending.append((keyframe_id, timestamp, self.scanner.submit_frame(frame)))
+                    keyframe_id += 1
+
+                    if writer is not None:
+                        current_detections = collect()
+                    else:
+                        # 取回已完成或超出在途上限的结果，遇到敏感帧时取回全部并开始写出
+                        found = False
+                        while len(pending) > max_in_flight or (pending and pending[0][2].done()):
+                            found = bool(collect()) or found
+                        if found:
+                            # 补写之前的帧，当前帧在下面按本区间的检测结果写出
+                            current_detections = start_writing()
+
+                if writer is not None:
+                    if current_detections:
+                        frame = self.masker.mask_frame(frame, current_detections, method=self.method)
+                    writer.write(frame)
+
+                frame_count += 1
+
+            # 取回剩余的在途结果，存在敏感帧时整段补写
+            found = False
+            while pending:
+                found = bool(collect()) or found
+            if found and writer is None:
+                start_writing()
+        finally:
+            cap.release()
+            if writer is not None:
+                writer.release()
+
+        # 因延迟上限提前写出、但整个切片没有敏感信息：输出与原切片相同，不保留
+        masked = writer is not None and bool(scan_results)
+        if writer is not None and not masked and os.path.exists(output_path):
+            os.remove(output_path)
+
+        print(f"扫描完成: {keyframe_id} 帧，发现 {len(scan_results)} 帧包含敏感信息")
+
+        return {
+            'scan_results': scan_results,
+            'masked': masked,
+            'frame_count': frame_count,
+            'keyframe_count': keyframe_id
+        }
+
+    @staticmethod
+    def _open_writer(output_path, fps, width, height):
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+    @staticmethod
+    def _detections_at(scan_results, keyframe_id):
+        """获取指定采样帧的检测结果，无敏感信息时返回None"""
+        for result in reversed(scan_results):
+            if result['frame_id'] == keyframe_id:
+                return result['scan_result']['detections']
+            if result['frame_id'] < keyframe_id:
+                break
+        return None
+
+    def _copy_prefix(self, input_path, writer, num_frames, frame_interval, scan_results):
+        """
+        重新解码切片开头的num_frames帧并写入输出，按所在采样区间的检测结果脱敏
+        :param input_path: 输入切片路径
+        :param writer: cv2.VideoWriter
+        :param num_frames: 需要补写的帧数
+        :param frame_interval: 采样间隔(帧数)
+        :param scan_results: 已取回的含敏感信息的扫描结果(按frame_id升序)
+        """
+        if num_frames <= 0:
+            return
+
+        detections_by_keyframe = {
+            result['frame_id']: result['scan_result']['detections'] for result in scan_results
+        }
+
+        cap = cv2.VideoCapture(input_path)
+        try:
+            for index in range(num_frames):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                detections = detections_by_keyframe.get(index // frame_interval)
+                if detections:
+                    frame = self.masker.mask_frame(frame, detections, method=self.method)
+                writer.write(frame)
+        finally:
+            cap.release()
@@ -0,0 +1,161 @@
+"""
+本地Tesseract工作池
+安装了tesserocr时，每个工作槽持有一个常驻的TessBaseAPI实例(只加载一次语言模型，不启动子进程、不写临时文件)；
+未安装或无法初始化(如缺少语言数据)时退回pytesseract(每次识别启动一个tesseract进程)，同样受工作槽数限制：
+超过工作槽数的识别请求排队等待，工作槽数由TESSERACT_WORKERS配置，默认按CPU核数。Tesseract可执行文件路径在进程内只探测一次
+"""
+import os
+import queue
+import shutil
+import threading
+from shared.config import Config
+
+# 常见的Tesseract安装路径
+TESSERACT_CANDIDATE_PATHS = [
+    r'D:\Tesseract\tesseract.exe',  # 用户自定义路径
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+    r'C:\Windows\System32\tesseract.exe',
+    '/usr/bin/tesseract',
+    '/usr/local/bin/tesseract'
+]
+
+# image_to_data 结果中用到的列
+_TSV_INT_FIELDS = ('block_num', 'par_num', 'line_num', 'left', 'top', 'width', 'height')
+
+_tesseract_cmd = None
+_tesseract_cmd_resolved = False
+_resolve_lock = threading.Lock()
+
+
+def resolve_tesseract_cmd():
+    """
+    解析Tesseract可执行文件路径(进程内只探测一次)
+    优先使用TESSERACT_CMD配置，其次是常见安装路径，最后在PATH中查找
+    :return: 可执行文件路径，找不到时返回None
+    """
+    global _tesseract_cmd, _tesseract_cmd_resolved
+    with _resolve_lock:
+        if not _tesseract_cmd_resolved:
+            _tesseract_cmd = Config.TESSERACT_CMD or next(
+                (path for path in TESSERACT_CANDIDATE_PATHS if os.path.exists(path)),
+                shutil.which('tesseract')
+            )
+            _tesseract_cmd_resolved = True
+        return _tesseract_cmd
+
+
+def default_pool_size():
+    """默认工作数：CPU核数平均分给本地流水线的各个进程"""
+    return max(1, (os.cpu_count() or 1) // max(1, Config.PIPELINE_WORKERS))
+
+
+class TesseractPool:
+    """Tesseract工作池，线程安全，调用方可并发调用image_to_data"""
+
+    def __init__(self, size=None, lang='eng+chi_sim'):
+        """
+        初始化
+        :param size: 工作槽数(同时进行的识别数)，默认按CPU核数
+        :param lang: 识别语言
+        """
+        self.size = max(1, size or Config.TESSERACT_WORKERS or default_pool_size())
+        self.lang = lang
+        self.cmd = resolve_tesseract_cmd()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._apis = queue.LifoQueue()
+        self._all_apis = []
+        self._lock = threading.Lock()
+
+        # 多个识别并发时，限制Tesseract内部的OpenMP线程，避免线程数超过核数(需在加载tesserocr之前设置)
+        if self.size > 1:
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+        self.backend = 'tesserocr' if self._init_tesserocr() else 'pytesseract'
+        if self.backend == 'pytesseract':
+            print(f"本地OCR使用pytesseract(每次识别启动一个进程)，并发上限 {self.size}")
+
+    def _init_tesserocr(self):
+        """
+        选择后端时先创建一个TessBaseAPI：只检查能否导入不够，缺少语言数据等问题要到创建实例时才暴露，
+        届时每次识别都会失败、扫描结果被当作没有文字
+        :return: tesserocr是否可用
+        """
+        try:
+            from tesserocr import PyTessBaseAPI
+        except ImportError:
+            return False
+
+        try:
+            api = PyTessBaseAPI(lang=self.lang)
+        except Exception as e:
+            print(f"⚠️  tesserocr初始化失败，改用pytesseract: {e}")
+            return False
+
+        self._all_apis.append(api)
+        self._apis.put(api)
+        return True
+
+    def image_to_data(self, pil_image):
+        """
+        识别图像，返回与 pytesseract.image_to_data(output_type=DICT) 相同结构的结果
+        两种后端都先占用一个工作槽，工作槽全部占用时阻塞等待
+        :param pil_image: PIL图像
+        :return: {'text': [...], 'conf': [...], 'left': [...], 'top': [...], 'width': [...], 'height': [...],
+                  'block_num': [...], 'par_num': [...], 'line_num': [...]}
+        """
+        with self._slots:
+            if self.backend == 'pytesseract':
+                import pytesseract
+                if self.cmd:
+                    pytesseract.pytesseract.tesseract_cmd = self.cmd
+                return pytesseract.image_to_data(pil_image, lang=self.lang, output_type=pytesseract.Output.DICT)
+
+            api = self._acquire_api()
+            try:
+                api.SetImage(pil_image)
+                tsv = api.GetTSVText(0)
+            finally:
+                api.Clear()
+                self._apis.put(api)
+        return self._parse_tsv(tsv)
+
+    def close(self):
+        """释放所有常驻的TessBaseAPI实例"""
+        with self._lock:
+            for api in self._all_apis:
+                api.End()
+            self._all_apis = []
+            self._apis = queue.LifoQueue()
+
+    def _acquire_api(self):
+        """取一个空闲的TessBaseAPI，不足工作槽数时新建(语言模型只在新建时加载)"""
+        try:
+            return self._apis.get_nowait()
+        except queue.Empty:
+            from tesserocr import PyTessBaseAPI
+            api = PyTessBaseAPI(lang=self.lang)
+            with self._lock:
+                self._all_apis.append(api)
+            return api
+
+    @staticmethod
+    def _parse_tsv(tsv):
+        """
+        解析TessBaseAPI.GetTSVText的输出(无表头)
+        列: level page_num block_num par_num line_num word_num left top width height conf text
+        """
+        data = {field: [] for field in _TSV_INT_FIELDS + ('conf', 'text')}
+        for row in tsv.splitlines():
+            columns = row.split('\t')
+            if len(columns) < 11:
+                continue
+            values = dict(zip(
+                ('level', 'page_num') + _TSV_INT_FIELDS[:3] + ('word_num',) + _TSV_INT_FIELDS[3:] + ('conf',),
+                columns[:11]
+            ))
+            for field in _TSV_INT_FIELDS:
+                data[field].append(int(values[field]))
+            data['conf'].append(float(values['conf']))
+            data['text'].append(columns[11] if len(columns) > 11 else '')
+        return data
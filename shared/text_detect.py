@@ -0,0 +1,102 @@
+"""
+文字区域检测模块
+OCR之前用形态学梯度做廉价的文字定位：文字笔画在缩小后的灰度图上形成密集的强边缘，
+水平闭运算把同一行的字符连成块，再按尺寸、宽高比和填充率过滤。
+没有候选区域的帧(空白画面、无字的摄像头画面)直接跳过OCR，其余只识别候选区域。
+闭运算连不上的词间距(如"password:  hunter2")会把一行拆成几块，同一行上相邻的块再按行的几何规则合并，
+保证一行文字在同一次识别中返回
+"""
+import cv2
+import numpy as np
+from shared.config import Config
+from shared.frame_diff import merge_rects, union_rect
+from shared.text_lines import LINE_GAP_FACTOR, LINE_OVERLAP_RATIO
+
+
+class TextRegionDetector:
+    """基于梯度的文字区域检测器"""
+
+    def __init__(self, width=None, gradient_threshold=None, min_height=None, padding=None):
+        """
+        初始化(参数默认取自Config)
+        :param width: 检测前将帧等比缩小到的宽度(像素)
+        :param gradient_threshold: 形态学梯度超过该值的像素视为边缘
+        :param min_height: 候选块的最小高度(缩小后的像素)
+        :param padding: 候选区域向外扩展的像素数(原图坐标)
+        """
+        self.width = width or Config.TEXT_DETECT_WIDTH
+        self.gradient_threshold = gradient_threshold or Config.TEXT_DETECT_GRADIENT_THRESHOLD
+        self.min_height = min_height or Config.TEXT_DETECT_MIN_HEIGHT
+        self.padding = Config.OCR_REGION_PADDING if padding is None else padding
+        self._gradient_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self._line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1))
+
+    def detect(self, frame, frame_height=None):
+        """
+        检测帧中可能包含文字的区域
+        :param frame: OpenCV图像(BGR或灰度)，可以是整帧中裁剪出的区域
+        :param frame_height: 裁剪区域所属整帧的高度，用于限制文字行的最大高度，默认为图像本身的高度
+        :return: 图像坐标的矩形列表 [(x1, y1, x2, y2), ...]，没有候选区域时为空列表
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.width / width)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (self.width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+        gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, self._gradient_kernel)
+        _, edges = cv2.threshold(gradient, self.gradient_threshold, 255, cv2.THRESH_BINARY)
+        blocks = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, self._line_kernel)
+
+        # 文字行高度不超过整帧高度的1/4
+        max_height = (frame_height or height) * scale * 0.25
+        _, _, boxes, _ = cv2.connectedComponentsWithStats(blocks, connectivity=8)
+
+        regions = []
+        for x, y, w, h, _ in boxes[1:]:
+            # 文字行：高度适中、横向展开、块内边缘足够密集
+            if h < self.min_height or h > max_height or w < h:
+                continue
+            if np.count_nonzero(edges[y:y + h, x:x + w]) < 0.2 * w * h:
+                continue
+            regions.append((
+                max(0, int(x / scale) - self.padding),
+                max(0, int(y / scale) - self.padding),
+                min(width, int((x + w) / scale) + self.padding),
+                min(height, int((y + h) / scale) + self.padding)
+            ))
+
+        return merge_rects(join_line_rects(regions))
+
+
+def join_line_rects(rects):
+    """
+    合并同一行上水平相邻的矩形
+    两个矩形的纵向重叠不小于较矮者高度的LINE_OVERLAP_RATIO、水平间距不超过较高者高度的LINE_GAP_FACTOR倍时视为同一行
+    :param rects: 矩形列表 [(x1, y1, x2, y2), ...]
+    :return: 合并后的矩形列表
+    """
+    merged = sorted(rects)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for rect in merged:
+            for i, other in enumerate(result):
+                if _same_line(rect, other):
+                    result[i] = union_rect(rect, other)
+                    changed = True
+                    break
+            else:
+                result.append(rect)
+        merged = result
+    return merged
+
+
+def _same_line(a, b):
+    height_a, height_b = a[3] - a[1], b[3] - b[1]
+    overlap = min(a[3], b[3]) - max(a[1], b[1])
+    if overlap < LINE_OVERLAP_RATIO * min(height_a, height_b):
+        return False
+    gap = max(a[0], b[0]) - min(a[2], b[2])
+    return gap <= LINE_GAP_FACTOR * max(height_a, height_b)
@@ -0,0 +1,103 @@
+"""
+OCR文本行组装模块
+将逐词的OCR结果重新组合成文本行，使跨词的敏感信息(如 "password: hunter2"、
+以空格分隔的银行卡号)可以在整行上一次匹配，并把匹配位置映射回单词边界框
+"""
+
+# 同一行内相邻单词的最大水平间距(相对于字高的倍数)，超过视为另一列
+LINE_GAP_FACTOR = 2.0
+# 两个单词垂直方向重叠达到较矮者高度的该比例时视为同一行
+LINE_OVERLAP_RATIO = 0.5
+
+
+def group_ocr_lines(ocr_results):
+    """
+    将OCR结果分组为文本行
+    带 'line' 键的结果(Tesseract的block/par/line编号)先按编号组成行段，其余结果(华为云OCR)每个单词各为一段；
+    再按边界框的垂直重叠和水平邻近关系把行段串成行。这样增量OCR沿用的旧单词、分区域识别的结果
+    与新识别的单词即使来自不同的识别调用(编号不同)，只要在画面上同处一行，仍会拼成同一行
+    :param ocr_results: OCR结果列表 [{'text', 'confidence', 'bbox', ['line']}, ...]
+    :return: 文本行列表 [{'text': str, 'words': [ocr_item, ...], 'spans': [(start, end), ...]}, ...]
+             spans[i]为words[i]在text中的字符区间
+    """
+    keyed = {}
+    segments = []
+    for item in ocr_results:
+        if item.get('line') is not None:
+            keyed.setdefault(item['line'], []).append(item)
+        else:
+            segments.append([item])
+
+    groups = _chain_segments(list(keyed.values()) + segments)
+
+    lines = []
+    for words in groups:
+        words = sorted(words, key=lambda item: item['bbox'][0])
+        spans = []
+        parts = []
+        position = 0
+        for word in words:
+            if parts:
+                position += 1  # 单词之间的空格
+            spans.append((position, position + len(word['text'])))
+            parts.append(word['text'])
+            position += len(word['text'])
+        lines.append({'text': ' '.join(parts), 'words': words, 'spans': spans})
+
+    return lines
+
+
+def words_in_span(line, start, end):
+    """
+    找出覆盖字符区间[start, end)的单词
+    :param line: group_ocr_lines返回的文本行
+    :return: 单词列表
+    """
+    return [
+        word for word, (word_start, word_end) in zip(line['words'], line['spans'])
+        if word_start < end and start < word_end
+    ]
+
+
+def union_bbox(words):
+    """
+    多个单词边界框的外接框
+    :param words: OCR结果列表
+    :return: (x, y, w, h)
+    """
+    x1 = min(word['bbox'][0] for word in words)
+    y1 = min(word['bbox'][1] for word in words)
+    x2 = max(word['bbox'][0] + word['bbox'][2] for word in words)
+    y2 = max(word['bbox'][1] + word['bbox'][3] for word in words)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+def _chain_segments(segments):
+    """按边界框邻近关系把行段串成行：从左到右依次接到垂直重叠最多且水平间距足够小的行尾"""
+    lines = []
+    for segment in sorted(segments, key=lambda words: min(word['bbox'][0] for word in words)):
+        x, y, w, h = union_bbox(segment)
+        best_line = None
+        best_overlap = 0
+
+        for line in lines:
+            lx, ly, lw, lh = line['tail']
+            overlap = min(y + h, ly + lh) - max(y, ly)
+            if overlap < LINE_OVERLAP_RATIO * min(h, lh):
+                continue
+
+            gap = x - (lx + lw)
+            if gap > LINE_GAP_FACTOR * max(h, lh) or gap < -0.5 * max(h, lh):
+                continue
+
+            if overlap > best_overlap:
+                best_line = line
+                best_overlap = overlap
+
+        if best_line is not None:
+            best_line['words'].extend(segment)
+            best_line['tail'] = (x, y, w, h)
+        else:
+            lines.append({'words': list(segment), 'tail': (x, y, w, h)})
+
+    return [line['words'] for line in lines]
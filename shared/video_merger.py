@@ -66,6 +66,10 @@ class VideoMerger:
             print("没有切片文件需要合并")
             return False
 
+        # 流复制切片保留源编码，脱敏切片为mp4v，编码不一致时concat无法直接复制
+        if len(self._get_codecs(slice_files)) > 1:
+            return self._merge_mixed_codecs(slice_files, output_path)
+
         # 创建临时文件列表
         list_file = output_path + '.list.txt'
         with open(list_file, 'w') as f:
@@ -106,6 +110,61 @@ class VideoMerger:
             print(f"合并异常: {str(e)}")
             return False
 
+    def _get_codecs(self, slice_files):
+        """
+        获取切片使用的视频编码集合
+        :param slice_files: 切片文件路径列表
+        :return: FourCC编码集合
+        """
+        codecs = set()
+        for slice_file in slice_files:
+            cap = cv2.VideoCapture(slice_file)
+            codecs.add(int(cap.get(cv2.CAP_PROP_FOURCC)))
+            cap.release()
+        return codecs
+
+    def _merge_mixed_codecs(self, slice_files, output_path):
+        """
+        使用FFmpeg concat滤镜合并编码不一致的切片(需要重新编码)
+        :param slice_files: 切片文件路径列表(按顺序)
+        :param output_path: 输出文件路径
+        :return: 是否成功
+        """
+        cmd = ['ffmpeg']
+        for slice_file in slice_files:
+            cmd += ['-i', os.path.abspath(slice_file)]
+
+        inputs = ''.join(f"[{i}:v:0]" for i in range(len(slice_files)))
+        cmd += [
+            '-filter_complex', f"{inputs}concat=n={len(slice_files)}:v=1:a=0[v]",
+            '-map', '[v]',
+            '-c:v', 'libx264',
+            '-preset', 'veryfast',
+            '-pix_fmt', 'yuv420p',
+            output_path,
+            '-y'
+        ]
+
+        try:
+            print(f"切片编码不一致，使用FFmpeg重新编码合并 {len(slice_files)} 个切片...")
+            result = subprocess.run(cmd, capture_output=True, text=True)
+
+            if result.returncode == 0:
+                print(f"合并完成: {output_path}")
+                return True
+            else:
+                print(f"FFmpeg错误: {result.stderr}")
+                return False
+
+        except FileNotFoundError:
+            print("未找到FFmpeg，请确保已安装FFmpeg并添加到PATH")
+            print("降级使用OpenCV合并...")
+            return self.merge_with_opencv(slice_files, output_path)
+
+        except Exception as e:
+            print(f"合并异常: {str(e)}")
+            return False
+
     def merge(self, slice_files, output_path, use_ffmpeg=True):
         """
         合并视频切片
@@ -153,15 +153,12 @@ class VideoProcessingService:
 
             # Step 1: 上传所有切片到OBS
             print("Step 1: 上传切片到OBS...")
-            obs_slice_keys = []
-            for i, local_file in enumerate(slice_files):
-                obs_key = f"temp/slices/{task_id}/slice_{i:04d}.mp4"
-                success = obs_helper.upload_file(local_file, obs_key)
-                if success:
-                    obs_slice_keys.append(obs_key)
-                    print(f"  上传切片 {i+1}/{len(slice_files)}: {obs_key}")
-                else:
+            obs_slice_keys = [f"temp/slices/{task_id}/slice_{i:04d}.mp4" for i in range(len(slice_files))]
+            upload_results = obs_helper.upload_many(list(zip(slice_files, obs_slice_keys)))
+            for local_file, obs_key in zip(slice_files, obs_slice_keys):
+                if not upload_results[obs_key]:
                     raise Exception(f"上传切片失败: {local_file}")
+            print(f"  已上传 {len(obs_slice_keys)} 个切片")
 
             # Step 2: 初始化MPC客户端
             credentials = BasicCredentials(Config.HUAWEI_CLOUD_AK, Config.HUAWEI_CLOUD_SK)
@@ -242,9 +239,7 @@ class VideoProcessingService:
 
             # Step 6: 清理临时文件
             print("Step 5: 清理临时文件...")
-            for obs_key in obs_slice_keys:
-                obs_helper.delete_object(obs_key)
-            obs_helper.delete_object(output_obs_key)
+            obs_helper.delete_many(obs_slice_keys + [output_obs_key])
 
             print(f"✓ MPC合并完成: {output_path}")
             return True
@@ -3,19 +3,24 @@
 将长视频切分成多个短片段
 """
 import os
+import csv
+import subprocess
 import cv2
 from datetime import timedelta
+from shared.config import Config
 
 
 class VideoSlicer:
     """视频切片器"""
 
-    def __init__(self, slice_duration=60):
+    def __init__(self, slice_duration=60, mode=None):
         """
         初始化
         :param slice_duration: 每个切片的时长(秒)，默认60秒
+        :param mode: 切片方式 'copy'(FFmpeg流复制) 或 'reencode'(OpenCV重编码)，默认读取配置
         """
         self.slice_duration = slice_duration
+        self.mode = mode or Config.SLICE_MODE
 
     def get_video_info(self, video_path):
         """获取视频信息"""
@@ -46,8 +51,99 @@ class VideoSlicer:
         :param output_dir: 输出目录
         :return: 切片文件列表
         """
+        segments = self.slice_video_segments(input_video_path, output_dir)
+        return [segment['path'] for segment in segments]
+
+    def slice_video_segments(self, input_video_path, output_dir):
+        """
+        切片视频并返回每个切片的真实起止时间
+        copy模式使用FFmpeg segment复用器按关键帧流复制切分，不重新编码；
+        FFmpeg不可用或执行失败时降级为OpenCV重编码
+        :param input_video_path: 输入视频路径
+        :param output_dir: 输出目录
+        :return: 切片列表 [{'index': int, 'path': str, 'start_time': float, 'end_time': float}, ...]
+        """
         os.makedirs(output_dir, exist_ok=True)
 
+        if self.mode == 'copy':
+            if self._check_ffmpeg():
+                segments = self._slice_with_ffmpeg(input_video_path, output_dir)
+                if segments:
+                    return segments
+                print("FFmpeg切片失败，降级使用OpenCV切片")
+            else:
+                print("FFmpeg不可用，使用OpenCV切片")
+
+        return self._slice_with_opencv(input_video_path, output_dir)
+
+    def _check_ffmpeg(self):
+        """检查FFmpeg是否可用"""
+        try:
+            subprocess.run(['ffmpeg', '-version'],
+                           capture_output=True,
+                           check=True,
+                           timeout=5)
+            return True
+        except Exception:
+            return False
+
+    def _slice_with_ffmpeg(self, input_video_path, output_dir):
+        """
+        使用FFmpeg segment复用器流复制切片
+        切点对齐到关键帧，因此切片时长会略有浮动，真实起止时间取自segment列表。
+        与OpenCV切片保持一致，只保留视频流（脱敏后的切片同样不含音频，合并时流结构需一致）
+        :return: 切片列表，失败时返回空列表
+        """
+        segment_list = os.path.join(output_dir, 'segments.csv')
+        cmd = [
+            'ffmpeg',
+            '-i', input_video_path,
+            '-map', '0:v:0',
+            '-an',
+            '-c', 'copy',
+            '-f', 'segment',
+            '-segment_time', str(self.slice_duration),
+            '-reset_timestamps', '1',
+            '-segment_list', segment_list,
+            '-segment_list_type', 'csv',
+            os.path.join(output_dir, 'slice_%04d.mp4'),
+            '-y'
+        ]
+
+        try:
+            print(f"使用FFmpeg流复制切片 (每段约{self.slice_duration}秒)...")
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"FFmpeg错误: {result.stderr}")
+                return []
+
+            segments = []
+            with open(segment_list, 'r', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    if len(row) < 3:
+                        continue
+                    filename, start_time, end_time = row[0], float(row[1]), float(row[2])
+                    segments.append({
+                        'index': len(segments),
+                        'path': os.path.join(output_dir, filename),
+                        'start_time': start_time,
+                        'end_time': end_time
+                    })
+                    print(f"已创建切片: {filename} ({start_time:.1f}s - {end_time:.1f}s)")
+
+            os.remove(segment_list)
+            print(f"切片完成，共生成 {len(segments)} 个文件")
+            return segments
+
+        except Exception as e:
+            print(f"FFmpeg切片异常: {str(e)}")
+            return []
+
+    def _slice_with_opencv(self, input_video_path, output_dir):
+        """
+        使用OpenCV逐帧重编码切片
+        :return: 切片列表
+        """
         video_info = self.get_video_info(input_video_path)
         print(f"视频信息: {video_info}")
 
@@ -61,7 +157,7 @@ class VideoSlicer:
         num_slices = int(total_duration / self.slice_duration) + 1
         print(f"将切分为 {num_slices} 个片段")
 
-        slice_files = []
+        segments = []
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
 
         for slice_idx in range(num_slices):
@@ -93,43 +189,77 @@ class VideoSlicer:
                 frames_read += 1
 
             out.release()
-            slice_files.append(slice_path)
+            segments.append({
+                'index': len(segments),
+                'path': slice_path,
+                'start_time': start_frame / fps,
+                'end_time': (start_frame + frames_read) / fps
+            })
             print(f"已创建切片: {slice_filename} ({start_time:.1f}s - {end_time:.1f}s)")
 
         cap.release()
-        print(f"切片完成，共生成 {len(slice_files)} 个文件")
-        return slice_files
+        print(f"切片完成，共生成 {len(segments)} 个文件")
+        return segments
 
-    def extract_keyframes(self, video_path, interval=1.0):
+    def extract_keyframes(self, video_path, interval=1.0, seek_threshold=None):
         """
-        提取关键帧
+        提取关键帧(一次性返回列表，长切片请使用iter_keyframes)
         :param video_path: 视频路径
         :param interval: 提取间隔(秒)，默认每秒1帧
+        :param seek_threshold: 间隔达到该值(秒)时使用跳转取帧，默认读取配置
         :return: 帧列表 [(frame_id, timestamp, frame_image), ...]
         """
+        frames = list(self.iter_keyframes(video_path, interval, seek_threshold))
+        print(f"提取了 {len(frames)} 个关键帧 (间隔={interval}秒)")
+        return frames
+
+    def iter_keyframes(self, video_path, interval=1.0, seek_threshold=None):
+        """
+        惰性迭代关键帧，任意时刻只持有当前一帧
+        跳过的帧只grab()不解码，仅采样帧retrieve()转换为BGR图像；
+        采样间隔较大时直接按帧号跳转，避免逐帧grab
+        :param video_path: 视频路径
+        :param interval: 提取间隔(秒)，默认每秒1帧
+        :param seek_threshold: 间隔达到该值(秒)时使用跳转取帧，默认读取配置
+        :return: 生成器，依次产出 (frame_id, timestamp, frame_image)
+        """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise Exception(f"无法打开视频文件: {video_path}")
 
+        if seek_threshold is None:
+            seek_threshold = Config.KEYFRAME_SEEK_THRESHOLD
+
         fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(fps * interval)
+        frame_interval = max(1, int(fps * interval))
 
-        frames = []
         frame_id = 0
         count = 0
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        try:
+            if interval >= seek_threshold:
+                # 大间隔：跳转到目标帧后只解码一帧
+                while True:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, count)
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
 
-            if count % frame_interval == 0:
-                timestamp = count / fps
-                frames.append((frame_id, timestamp, frame))
-                frame_id += 1
+                    yield frame_id, count / fps, frame
+                    frame_id += 1
+                    count += frame_interval
+            else:
+                while True:
+                    if not cap.grab():
+                        break
 
-            count += 1
+                    if count % frame_interval == 0:
+                        ret, frame = cap.retrieve()
+                        if not ret:
+                            break
+                        yield frame_id, count / fps, frame
+                        frame_id += 1
 
-        cap.release()
-        print(f"提取了 {len(frames)} 个关键帧 (间隔={interval}秒)")
-        return frames
+                    count += 1
+        finally:
+            cap.release()
@@ -78,6 +78,40 @@ CREATE TABLE IF NOT EXISTS system_config (
     INDEX idx_config_key (config_key)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='系统配置表';
 
+-- 5. 视频内容去重索引
+-- 相同内容(SHA-256)在相同DLP配置指纹下只处理一次，重复上传直接复用已有的脱敏结果和审计日志
+CREATE TABLE IF NOT EXISTS video_content_index (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    content_hash CHAR(64) NOT NULL COMMENT '视频内容SHA-256',
+    config_fingerprint CHAR(64) NOT NULL COMMENT 'DLP配置指纹',
+    video_id VARCHAR(64) NOT NULL COMMENT '首次处理该内容的视频ID',
+    status ENUM('processing', 'completed', 'failed') DEFAULT 'processing' COMMENT '处理状态',
+    obs_output_path VARCHAR(512) COMMENT '脱敏后视频的OBS路径',
+    audit_log_path VARCHAR(512) COMMENT '审计日志的OBS路径',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_content (content_hash, config_fingerprint),
+    INDEX idx_video_id (video_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='视频内容去重索引';
+
+-- 6. 切片完成跟踪(合并屏障)
+-- DLP扫描函数乱序完成，每个切片完成时登记一次，全部完成时只触发一次合并
+CREATE TABLE IF NOT EXISTS merge_barriers (
+    video_id VARCHAR(64) PRIMARY KEY COMMENT '视频ID',
+    total_slices INT NOT NULL COMMENT '切片总数',
+    done_slices INT NOT NULL DEFAULT 0 COMMENT '已完成的切片数',
+    merge_triggered TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否已触发合并',
+    triggered_at DATETIME COMMENT '触发合并的时间',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='视频合并屏障';
+
+CREATE TABLE IF NOT EXISTS slice_completions (
+    video_id VARCHAR(64) NOT NULL COMMENT '视频ID',
+    slice_index INT NOT NULL COMMENT '切片索引',
+    completed_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '完成时间',
+    PRIMARY KEY (video_id, slice_index)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='切片完成记录';
+
 -- 插入默认配置
 INSERT INTO system_config (config_key, config_value, description) VALUES
 ('dlp_enabled', 'true', 'DLP功能是否启用'),